@@ -0,0 +1,269 @@
+import argparse
+import json
+import os
+
+import numpy as np
+
+from export import in_range, iter_archive, timestamp
+from journal import iter_items
+from task_tree import task_type
+
+# Time-per-app analytics over tasks and archive. Records are loaded once
+# into columnar NumPy arrays (epoch seconds for created_at, integer codes
+# for app and type), after which every report is a handful of vectorized
+# operations, so a million records take milliseconds.
+#
+#   python analytics.py --start 2025-01-01 --end 2025-02-01
+#   python analytics.py --source archive --json
+
+
+class TaskColumns:
+    # Tasks as parallel arrays sorted by created_at. app_codes and
+    # type_codes index into apps and types. Each task lasts until the next
+    # one starts, capped at max_gap seconds (longer gaps are breaks), the
+    # same rule export.py uses.
+
+    def __init__(self, created, app_codes, type_codes, completed, apps, types, max_gap=30 * 60):
+        self.created = created
+        self.app_codes = app_codes
+        self.type_codes = type_codes
+        self.completed = completed
+        self.apps = apps
+        self.types = types
+        self.max_gap = max_gap
+        self._streaks = None
+
+        gaps = np.diff(created)
+        self.durations = np.append(np.minimum(gaps, int(max_gap)), 0) if len(created) else gaps
+        # True where the user kept working into the next task without a break
+        self.continued = np.append(gaps <= max_gap, False) if len(created) else gaps > 0
+
+    @classmethod
+    def from_tasks(cls, tasks, max_gap=30 * 60):
+        # Strings are coded while streaming; the timestamps are parsed in
+        # one go by NumPy ("YYYY-MM-DD HH:MM:SS" -> datetime64)
+        app_index = {}
+        type_index = {}
+        window_index = {}
+        stamps = []
+        app_codes = []
+        type_codes = []
+        window_codes = []
+        completed = []
+        keys = []
+        for task in tasks:
+            stamps.append(task['created_at'].replace(" ", "T"))
+            app_codes.append(app_index.setdefault(task['app_name'], len(app_index)))
+            type_codes.append(type_index.setdefault(task_type(task), len(type_index)))
+            window_codes.append(window_index.setdefault(task['window_name'], len(window_index)))
+            completed.append(task['completed'])
+            keys.append(task.get('id', -1))
+
+        created = np.array(stamps, dtype='datetime64[s]').astype(np.int64)
+        app_codes = np.array(app_codes, dtype=np.int32)
+        type_codes = np.array(type_codes, dtype=np.int32)
+        window_codes = np.array(window_codes, dtype=np.int32)
+        completed = np.array(completed, dtype=bool)
+        ids = np.array(keys, dtype=np.int64)
+
+        # Sort by time; copies of one task (in tasks.json and the archive,
+        # or archived twice) end up next to each other and are dropped. The
+        # key is export.dedupe's: created_at, app, window and id (tasks
+        # saved before IDs existed all count as id -1). The sort is stable,
+        # so the first copy (tasks.json) is the one kept.
+        order = np.lexsort((ids, window_codes, app_codes, created))
+        created, app_codes, window_codes, type_codes, completed, ids = (
+            created[order], app_codes[order], window_codes[order], type_codes[order],
+            completed[order], ids[order])
+        unique = np.ones(len(created), dtype=bool)
+        unique[1:] = ((created[1:] != created[:-1]) | (app_codes[1:] != app_codes[:-1]) |
+                      (window_codes[1:] != window_codes[:-1]) | (ids[1:] != ids[:-1]))
+
+        return cls(created[unique], app_codes[unique], type_codes[unique], completed[unique],
+                   np.array(list(app_index), dtype=object),
+                   np.array(list(type_index), dtype=object), max_gap)
+
+    def __len__(self):
+        return len(self.created)
+
+    def select(self, start=None, end=None):
+        # Tasks created in [start, end), given as datetime64-compatible strings
+        mask = np.ones(len(self.created), dtype=bool)
+        if start is not None:
+            mask &= self.created >= epoch(start)
+        if end is not None:
+            mask &= self.created < epoch(end)
+        return TaskColumns(self.created[mask], self.app_codes[mask], self.type_codes[mask],
+                           self.completed[mask], self.apps, self.types, self.max_gap)
+
+    # Totals
+
+    def time_per_app(self):
+        return self._totals(self.app_codes, self.apps)
+
+    def time_per_type(self):
+        return self._totals(self.type_codes, self.types)
+
+    def time_per_hour(self):
+        # Seconds per hour of day (0-23), attributed to the hour a task starts
+        hours = (self.created // 3600) % 24
+        return np.bincount(hours, weights=self.durations, minlength=24).astype(np.int64)
+
+    def time_per_day(self):
+        # created is sorted, so each day is one contiguous slice
+        days = self.created // 86400
+        if not len(days):
+            return {}
+        starts = np.flatnonzero(np.append(True, days[1:] != days[:-1]))
+        seconds = np.add.reduceat(self.durations, starts)
+        labels = days[starts].astype('datetime64[D]').astype(str)
+        return dict(zip(labels.tolist(), seconds.tolist()))
+
+    def _totals(self, codes, names):
+        seconds = np.bincount(codes, weights=self.durations, minlength=len(names))
+        counts = np.bincount(codes, minlength=len(names))
+        order = np.argsort(-seconds, kind='stable')
+        return [(names[i], int(seconds[i]), int(counts[i])) for i in order if counts[i]]
+
+    # Switching and focus
+
+    def switches(self):
+        # App changes between consecutive tasks, not counting changes
+        # across a break; per app, how often it was switched to
+        changed = (self.app_codes[1:] != self.app_codes[:-1]) & self.continued[:-1]
+        into = np.bincount(self.app_codes[1:][changed], minlength=len(self.apps))
+        order = np.argsort(-into, kind='stable')
+        return int(changed.sum()), [(self.apps[i], int(into[i])) for i in order if into[i]]
+
+    def streaks(self):
+        # Focus streaks: runs of consecutive tasks in the same app with no
+        # break in between. Returns (app code, start, seconds, tasks) arrays.
+        if self._streaks is not None:
+            return self._streaks
+        if not len(self.created):
+            empty = np.array([], dtype=np.int64)
+            return empty, empty, empty, empty
+        boundary = np.ones(len(self.created), dtype=bool)
+        boundary[1:] = (self.app_codes[1:] != self.app_codes[:-1]) | ~self.continued[:-1]
+        run_ids = np.cumsum(boundary) - 1
+        starts = np.flatnonzero(boundary)
+        seconds = np.bincount(run_ids, weights=self.durations).astype(np.int64)
+        tasks = np.bincount(run_ids)
+        self._streaks = (self.app_codes[starts], self.created[starts], seconds, tasks)
+        return self._streaks
+
+    def longest_streaks(self, top=10):
+        apps, starts, seconds, tasks = self.streaks()
+        # Partition out the top streaks before sorting just those
+        if top < len(seconds):
+            candidates = np.argpartition(-seconds, top)[:top]
+        else:
+            candidates = np.arange(len(seconds))
+        order = candidates[np.argsort(-seconds[candidates], kind='stable')]
+        return [(self.apps[apps[i]], format_epoch(starts[i]), int(seconds[i]), int(tasks[i]))
+                for i in order]
+
+    def streaks_per_app(self):
+        # (app, longest streak, average streak) in seconds, longest first
+        apps, _, seconds, _ = self.streaks()
+        if not len(apps):
+            return []
+        longest = np.zeros(len(self.apps), dtype=np.int64)
+        np.maximum.at(longest, apps, seconds)
+        counts = np.bincount(apps, minlength=len(self.apps))
+        totals = np.bincount(apps, weights=seconds, minlength=len(self.apps))
+        order = np.argsort(-longest, kind='stable')
+        return [(self.apps[i], int(longest[i]), int(totals[i] / counts[i]))
+                for i in order if counts[i]]
+
+    def report(self, top=10):
+        total_switches, switched_to = self.switches()
+        return {
+            'tasks': len(self),
+            'seconds': int(self.durations.sum()),
+            'per_app': self.time_per_app(),
+            'per_type': self.time_per_type(),
+            'per_hour': self.time_per_hour().tolist(),
+            'per_day': self.time_per_day(),
+            'switches': total_switches,
+            'switched_to': switched_to[:top],
+            'streaks_per_app': self.streaks_per_app()[:top],
+            'longest_streaks': self.longest_streaks(top)
+        }
+
+
+def epoch(value):
+    return np.datetime64(value.replace(" ", "T"), 's').astype(np.int64)
+
+
+def format_epoch(seconds):
+    return str(np.datetime64(int(seconds), 's')).replace("T", " ")
+
+
+def load_columns(start=None, end=None, sources=("tasks", "archive"), tasks_file="tasks.json",
+                 archive_file="archive.json", archive_backend=None, max_gap=30 * 60):
+    # Unsorted streams are fine: TaskColumns sorts by time itself
+    streams = []
+    if "tasks" in sources:
+        streams.append(in_range(iter_items(tasks_file), start, end))
+    if "archive" in sources:
+        streams.append(iter_archive(archive_file, start, end, archive_backend))
+    return TaskColumns.from_tasks((task for stream in streams for task in stream), max_gap)
+
+
+def format_hours(seconds):
+    return f"{seconds / 3600:6.1f}h"
+
+
+def print_report(report):
+    print(f"{report['tasks']} tasks, {format_hours(report['seconds']).strip()} tracked, "
+          f"{report['switches']} app switches\n")
+
+    for title, rows in (("Time per app", report['per_app']), ("Time per type", report['per_type'])):
+        print(title)
+        for name, seconds, count in rows:
+            print(f"  {name:<36}{format_hours(seconds)}{count:>7} tasks")
+        print()
+
+    print("Time per hour of day")
+    peak = max(report['per_hour']) or 1
+    for hour, seconds in enumerate(report['per_hour']):
+        if seconds:
+            print(f"  {hour:02d}:00 {format_hours(seconds)}  {'█' * round(30 * seconds / peak)}")
+    print()
+
+    print("Focus streaks per app (longest / average)")
+    for name, longest, average in report['streaks_per_app']:
+        print(f"  {name:<36}{longest / 60:6.0f}m {average / 60:6.1f}m")
+    print()
+
+    print("Longest streaks")
+    for name, started, seconds, count in report['longest_streaks']:
+        print(f"  {started}  {name:<28}{seconds / 60:6.0f}m{count:>5} tasks")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time per app, type and hour from tracked tasks")
+    parser.add_argument("--start", type=timestamp, help="first day (inclusive)")
+    parser.add_argument("--end", type=timestamp, help="last day (exclusive)")
+    parser.add_argument("--source", choices=["all", "tasks", "archive"], default="all")
+    parser.add_argument("--max-gap", type=float, default=30,
+                        help="minutes after which a gap between tasks counts as a break")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--tasks-file", default="tasks.json")
+    parser.add_argument("--archive-file", default="archive.json")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    sources = ("tasks", "archive") if args.source == "all" else (args.source,)
+    columns = load_columns(args.start, args.end, sources, args.tasks_file, args.archive_file,
+                           os.environ.get("ARCHIVE_BACKEND"), max_gap=args.max_gap * 60)
+    report = columns.report(args.top)
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+import json
+import os
+import sqlite3
+import time
+from threading import Lock, Thread
+
+from journal import JournalStore
+from persistence import WRITER
+from task_store import TaskRecord
+
+TASK_FIELDS = ('text', 'completed', 'created_at', 'auto_tracked', 'app_name', 'window_name')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    text TEXT NOT NULL,
+    completed INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    auto_tracked INTEGER NOT NULL,
+    app_name TEXT NOT NULL,
+    window_name TEXT NOT NULL,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS tasks_created_at ON tasks (created_at);
+CREATE INDEX IF NOT EXISTS tasks_app_name ON tasks (app_name, created_at);
+CREATE INDEX IF NOT EXISTS tasks_completed ON tasks (completed, created_at);
+"""
+
+
+def open_archive_store(json_path, backend=None):
+    # ARCHIVE_BACKEND=sqlite keeps the archive in "<name>.db" next to the
+    # JSON file (migrating it on first use); the default stays journaled JSON
+    backend = backend or os.environ.get("ARCHIVE_BACKEND", "json")
+    if backend == "sqlite":
+        store = ArchiveDB(os.path.splitext(json_path)[0] + ".db")
+        store.migrate_json(json_path)
+        return store
+    store = JournalStore(json_path, record=TaskRecord)
+    store.load()
+    return store
+
+
+class DeferredArchive:
+    # Opens the archive off the startup path. start() loads it on a
+    # background thread; any use before that finishes waits for it, and use
+    # without start() loads it on the spot. Only the store surface the
+    # helper needs (load/append/extend/replace/compact/flush/close) is
+    # passed through.
+
+    def __init__(self, json_path, backend=None):
+        self.json_path = json_path
+        self.backend = backend
+        self.lock = Lock()
+        self.thread = None
+        self.opened = None
+        self.error = None
+        self.load_time = None
+
+    def start(self):
+        with self.lock:
+            if self.thread is None and self.opened is None:
+                self.thread = Thread(target=self._open, daemon=True)
+                self.thread.start()
+        return self
+
+    def _open(self):
+        started = time.perf_counter()
+        try:
+            self.opened = open_archive_store(self.json_path, self.backend)
+        except Exception as e:
+            self.error = e
+        self.load_time = time.perf_counter() - started
+
+    def store(self):
+        if self.opened is None:
+            self.start()
+            self.thread.join()
+            if self.error is not None:
+                raise self.error
+        return self.opened
+
+    @property
+    def loaded(self):
+        return self.opened is not None
+
+    def load(self):
+        return self.store().load()
+
+    def append(self, task):
+        self.store().append(task)
+
+    def extend(self, tasks):
+        self.store().extend(tasks)
+
+    def replace(self, tasks):
+        self.store().replace(tasks)
+
+    def compact(self):
+        self.store().compact()
+
+    def iter_newest(self):
+        # Archived tasks, newest first; SQLite streams them instead of
+        # loading the whole archive
+        store = self.store()
+        if isinstance(store, ArchiveDB):
+            return store.iter_tasks(newest_first=True)
+        return reversed(store.load())
+
+    def flush(self):
+        if self.thread is not None:
+            self.store().flush()
+
+    def close(self):
+        # Nothing to close if the archive was never touched
+        if self.thread is not None:
+            self.store().close()
+
+
+class ArchiveDB:
+    # SQLite storage engine for archived tasks. It offers the same
+    # load/append/extend/replace surface as JournalStore, plus streaming
+    # queries that never hold the whole archive in memory. created_at keeps
+    # its "%Y-%m-%d %H:%M:%S" format, which sorts chronologically as text.
+    #
+    # Archived tasks are turned into rows right away but inserted by the
+    # WriteBehind writer; queries insert whatever is still pending first.
+
+    def __init__(self, path, writer=None):
+        self.path = path
+        self.writer = writer or WRITER
+        self.lock = Lock()
+        self.rows = []  # not inserted yet, guarded by rows_lock
+        self.rows_lock = Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def migrate_json(self, json_path):
+        # One-time import of an existing JSON archive into an empty database
+        if not os.path.exists(json_path) or self.count():
+            return 0
+        journal = JournalStore(json_path)
+        tasks = journal.load()
+        journal.close()
+        self.extend(tasks)
+        return len(tasks)
+
+    # Same surface as JournalStore
+
+    def load(self):
+        return list(self.iter_tasks())
+
+    def append(self, task):
+        self.extend([task])
+
+    def extend(self, tasks):
+        rows = [self._to_row(task) for task in tasks]
+        if rows:
+            with self.rows_lock:
+                self.rows.extend(rows)
+            self.writer.mark(self._insert_rows)
+
+    def replace(self, tasks):
+        with self.lock, self.conn:
+            with self.rows_lock:
+                self.rows = []
+            self.conn.execute("DELETE FROM tasks")
+        self.extend(tasks)
+
+    def compact(self):
+        self.writer.mark(self._checkpoint)
+
+    def flush(self):
+        self.writer.flush()
+
+    def close(self):
+        self.writer.flush()
+        with self.lock:
+            self.conn.close()
+
+    def _insert_rows(self):
+        # Holding self.lock throughout, so a query that comes in meanwhile
+        # waits for these rows instead of missing them
+        with self.lock:
+            with self.rows_lock:
+                rows, self.rows = self.rows, []
+            if rows:
+                with self.conn:
+                    self.conn.executemany(
+                        "INSERT INTO tasks (text, completed, created_at, auto_tracked, app_name, "
+                        "window_name, extra) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def _checkpoint(self):
+        self._insert_rows()
+        with self.lock:
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def update_texts(self, relabel, batch_size=500):
+        # Rewrite task texts in place: relabel(task) returns the new text or
+        # None to leave the task alone. Returns the number of tasks changed.
+        changed = 0
+        updates = []
+        for rowid, task in self._stream("SELECT id, text, completed, created_at, auto_tracked, "
+                                        "app_name, window_name, extra FROM tasks ORDER BY id",
+                                        [], with_ids=True):
+            text = relabel(task)
+            if text is not None and text != task['text']:
+                updates.append((text, rowid))
+            if len(updates) >= batch_size:
+                changed += self._update_texts(updates)
+                updates = []
+        return changed + self._update_texts(updates)
+
+    def _update_texts(self, updates):
+        if updates:
+            with self.lock, self.conn:
+                self.conn.executemany("UPDATE tasks SET text = ? WHERE id = ?", updates)
+        return len(updates)
+
+    # Queries
+
+    def count(self):
+        self._insert_rows()
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    def iter_tasks(self, start=None, end=None, app_name=None, completed=None, newest_first=False):
+        # Stream tasks in created_at order (or newest first); start is
+        # inclusive, end exclusive
+        clauses = []
+        params = []
+        if start is not None:
+            clauses.append("created_at >= ?")
+            params.append(self._timestamp(start))
+        if end is not None:
+            clauses.append("created_at < ?")
+            params.append(self._timestamp(end))
+        if app_name is not None:
+            clauses.append("app_name = ?")
+            params.append(app_name)
+        if completed is not None:
+            clauses.append("completed = ?")
+            params.append(int(completed))
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        order = "created_at DESC, id DESC" if newest_first else "created_at, id"
+        return self._stream(
+            f"SELECT text, completed, created_at, auto_tracked, app_name, window_name, extra "
+            f"FROM tasks{where} ORDER BY {order}", params)
+
+    def iter_range(self, start, end):
+        return self.iter_tasks(start=start, end=end)
+
+    def iter_app(self, app_name, start=None, end=None):
+        return self.iter_tasks(start=start, end=end, app_name=app_name)
+
+    def _stream(self, sql, params, with_ids=False):
+        # A separate read connection per query: WAL lets it run alongside
+        # writes, and rows are fetched in chunks as the caller iterates.
+        # with_ids yields (row id, task) for queries that select id first.
+        self._insert_rows()
+        conn = sqlite3.connect(self.path)
+        try:
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(500)
+                if not rows:
+                    break
+                for row in rows:
+                    if with_ids:
+                        yield row[0], self._from_row(row[1:])
+                    else:
+                        yield self._from_row(row)
+        finally:
+            conn.close()
+
+    def _timestamp(self, value):
+        if isinstance(value, str):
+            return value
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+
+    def _to_row(self, task):
+        extra = {key: value for key, value in task.items() if key not in TASK_FIELDS}
+        return (task['text'], int(task['completed']), task['created_at'],
+                int(task.get('auto_tracked', False)), task['app_name'], task['window_name'],
+                json.dumps(extra) if extra else None)
+
+    def _from_row(self, row):
+        task = {
+            'text': row[0],
+            'completed': bool(row[1]),
+            'created_at': row[2],
+            'auto_tracked': bool(row[3]),
+            'app_name': row[4],
+            'window_name': row[5]
+        }
+        if row[6]:
+            task.update(json.loads(row[6]))
+        return task
@@ -0,0 +1,342 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from archive_db import open_archive_store
+from classifier import TitleClassifier
+from fake_openai import FakeOpenAIServer
+from journal import JournalStore
+from macbook_helper import MacBookHelper
+from probes import ScriptedProbe
+from task_store import TaskRecord
+from task_tree import TaskTreeRenderer
+from tracker import Tracker
+
+# Headless benchmarks for the tracker's and MacBookHelper's hot paths. Tk
+# is replaced by a stub Treeview, OpenAI by the local fake server and window probes by a
+# scripted backend, so runs are reproducible on any machine. Results are
+# printed (or written) as JSON so revisions can be compared.
+#
+#   python bench.py --sizes 100,10000,1000000 --output bench.json
+
+APPS = ["Google Chrome", "Cursor", "Microsoft Word", "Microsoft Excel", "Slack",
+        "Preview", "Terminal", "Outlook", "Safari", "Notion"]
+WINDOWS = ["Inbox - {n}", "main_{n}.py", "Report {n}.docx", "Budget {n}.xlsx",
+           "Pull request #{n}", "Design review {n}", "Ticket {n} - Jira", "Notes {n}"]
+PREFIXES = ["Working on", "Using {app}", "Browsing", "Editing", "Viewing"]
+
+
+def make_tasks(count, seed=0, completed_ratio=0.3):
+    rng = random.Random(seed)
+    moment = datetime(2025, 1, 1, 9, 0, 0)
+    tasks = []
+    for n in range(count):
+        app = rng.choice(APPS)
+        window = rng.choice(WINDOWS).format(n=n)
+        prefix = rng.choice(PREFIXES).format(app=app)
+        moment += timedelta(seconds=rng.randint(5, 900))
+        tasks.append({
+            'text': f"{prefix}: {window}",
+            'completed': rng.random() < completed_ratio,
+            'created_at': moment.strftime("%Y-%m-%d %H:%M:%S"),
+            'auto_tracked': rng.random() < 0.5,
+            'app_name': app,
+            'window_name': window
+        })
+    return tasks
+
+
+class StubTreeview:
+    # Just enough of ttk.Treeview for TaskTreeRenderer
+    def __init__(self):
+        self.children = {'': []}
+        self.parents = {}
+        self.ids = itertools.count()
+
+    def insert(self, parent, index, **options):
+        item = f"I{next(self.ids)}"
+        self.children[item] = []
+        self.parents[item] = parent
+        if index == 'end':
+            self.children[parent].append(item)
+        else:
+            self.children[parent].insert(index, item)
+        return item
+
+    def delete(self, *items):
+        for item in items:
+            if item in self.parents:
+                self.delete(*self.children[item])
+                self.children[self.parents.pop(item)].remove(item)
+                del self.children[item]
+
+    def move(self, item, parent, index):
+        self.children[self.parents[item]].remove(item)
+        self.parents[item] = parent
+        if index == 'end':
+            self.children[parent].append(item)
+        else:
+            self.children[parent].insert(index, item)
+
+    def item(self, item, **options):
+        pass
+
+    def get_children(self, item=''):
+        return tuple(self.children[item])
+
+    def parent(self, item):
+        return self.parents[item]
+
+    def tag_configure(self, *args, **options):
+        pass
+
+
+class StubVar:
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+class StubLabel:
+    def config(self, **options):
+        pass
+
+
+def make_helper(workdir, tasks, archived, openai_url, archive_backend="json"):
+    # A Tracker on files in workdir, plus a MacBookHelper assembled without
+    # running __init__ (which opens a Tk window and starts monitoring)
+    import openai
+
+    tasks_file = os.path.join(workdir, "tasks.json")
+    archive_file = os.path.join(workdir, "archive.json")
+    for path, items in ((tasks_file, tasks), (archive_file, archived)):
+        with open(path, 'w') as f:
+            json.dump(items, f)
+
+    probe = ScriptedProbe([(task['app_name'], task['window_name']) for task in tasks[:1000]],
+                          loop=True)
+    tracker = Tracker(tasks_file, archive_file,
+                      cache_file=os.path.join(workdir, "description_cache.db"),
+                      patterns_file=os.path.join(workdir, "patterns.json"),
+                      probe=probe, archive_backend=archive_backend)
+    tracker.openai_client = openai.OpenAI(base_url=openai_url, api_key="bench", max_retries=0)
+    tracker.archive_store = open_archive_store(archive_file, archive_backend)
+
+    helper = MacBookHelper.__new__(MacBookHelper)
+    helper.tracker = tracker
+    helper.tree = StubTreeview()
+    helper.renderer = TaskTreeRenderer(helper.tree)
+    helper.org_method = StubVar("Type")
+    helper.rendered_org_method = None
+    helper.stats_label = StubLabel()
+    return helper, tracker
+
+
+def close_helper(helper):
+    helper.tracker.close()
+
+
+def measure(fn, repeat, setup=None, calls=1):
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) / calls)
+    return {'median_s': statistics.median(times), 'min_s': min(times),
+            'max_s': max(times), 'runs': repeat, 'calls_per_run': calls}
+
+
+def bench_size(size, repeat, openai_url, archive_backend):
+    tasks = make_tasks(size, seed=size)
+    archived = make_tasks(size, seed=size + 1, completed_ratio=1.0)
+    results = {}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        helper, tracker = make_helper(workdir, tasks, archived, openai_url, archive_backend)
+
+        def full_refresh():
+            helper.rendered_org_method = None
+            helper.refresh_tasks()
+
+        results['refresh_tasks.full'] = measure(full_refresh, repeat)
+
+        def open_all_groups():
+            full_refresh()
+            for item in list(helper.renderer.groups.values()):
+                helper.renderer.expand(item)
+
+        # First page of every group, as if the user opened them all
+        results['refresh_tasks.open_all_groups'] = measure(open_all_groups, repeat)
+        results['refresh_tasks.idle'] = measure(helper.refresh_tasks, repeat)
+
+        toggled = itertools.cycle(list(tracker.tasks)[:repeat])
+
+        def toggle_one():
+            task = next(toggled)
+            tracker.tasks.update(task, completed=not task['completed'])
+
+        results['refresh_tasks.one_change'] = measure(helper.refresh_tasks, repeat, setup=toggle_one)
+
+        def save_tasks():
+            tracker.save_tasks()
+            tracker.task_journal.flush()
+
+        def save_archive():
+            tracker.save_archive()
+            tracker.archive_store.flush()
+
+        results['save_tasks'] = measure(save_tasks, repeat)
+        results['save_archive'] = measure(save_archive, repeat)
+
+        # Load from disk into fresh stores, leaving the tracker's own intact
+        task_journal = tracker.task_journal
+        archive_store = tracker.archive_store
+
+        def load_tasks():
+            tracker.task_journal = JournalStore(tracker.tasks_file, record=TaskRecord)
+            tracker.load_tasks()
+            tracker.task_journal.close()
+
+        def load_archive():
+            tracker.archive_store = open_archive_store(tracker.archive_file, archive_backend)
+            tracker.load_archive()
+            tracker.archive_store.close()
+
+        results['load_tasks'] = measure(load_tasks, repeat)
+        results['load_archive'] = measure(load_archive, repeat)
+        tracker.task_journal = task_journal
+        tracker.archive_store = archive_store
+
+        # Columnar analytics need numpy, which the tracker itself does not
+        try:
+            from analytics import TaskColumns
+        except ImportError:
+            TaskColumns = None
+        if TaskColumns is not None:
+            columns = TaskColumns.from_tasks(tasks + archived)
+            results['analytics.load'] = measure(lambda: TaskColumns.from_tasks(tasks + archived), repeat)
+
+            def forget_streaks():
+                columns._streaks = None
+
+            results['analytics.report'] = measure(columns.report, repeat, setup=forget_streaks)
+
+        # Windows of open tasks: a completed task's window would miss in
+        # find() and rename another open task through find_app(), so runs
+        # after the first would measure a different path
+        lookups = [(task['app_name'], task['window_name']) for task in itertools.islice(
+            (task for task in tracker.tasks if not task['completed']), 1000)]
+        misses = [(app, f"missing {n}") for n, (app, _) in enumerate(lookups)]
+        results['task_exists.hit'] = measure(
+            lambda: [tracker.task_exists(app, window) for app, window in lookups],
+            repeat, calls=len(lookups))
+        results['task_exists.miss_browser'] = measure(
+            lambda: [tracker.task_exists("Google Chrome", window) for _, window in misses],
+            repeat, calls=len(misses))
+
+        results['get_active_application'] = measure(
+            lambda: [tracker.get_active_application() for _ in range(1000)], repeat, calls=1000)
+
+        # Titles that no pattern matches, so they go to the cache or network
+        unmatched = [("Notion", f"Roadmap {size}-{n}") for n in range(repeat)]
+        uncached = iter(unmatched)
+        results['generate_task_description.uncached'] = measure(
+            lambda: tracker.generate_task_description(*next(uncached)), repeat)
+        results['generate_task_description.cached'] = measure(
+            lambda: [tracker.generate_task_description(app, window) for app, window in unmatched],
+            repeat, calls=len(unmatched))
+        results['generate_task_description.pattern'] = measure(
+            lambda: [tracker.generate_task_description(app, window) for app, window in lookups],
+            repeat, calls=len(lookups))
+
+        # Local title model: bootstrap from the archive, then windows it
+        # has not seen
+        results['classifier.train'] = measure(
+            lambda: TitleClassifier().train(reversed(archived)), repeat)
+        classifier = tracker.classifier
+        classifier.train(reversed(archived))
+        unseen = [(task['app_name'], f"{task['window_name']} draft") for task in archived[:1000]]
+        results['classifier.predict'] = measure(
+            lambda: [classifier.predict(app, window) for app, window in unseen],
+            repeat, calls=len(unseen))
+
+        close_helper(helper)
+    return results
+
+
+def bench_startup(repeat):
+    # Import cost of macbook_helper in a fresh interpreter each run
+    code = ("import time; started = time.perf_counter(); import macbook_helper; "
+            "print(time.perf_counter() - started)")
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    times = []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True,
+                                text=True, cwd=cwd, check=True)
+        times.append(float(result.stdout.split()[-1]))
+    return {'startup.import': {'median_s': statistics.median(times), 'min_s': min(times),
+                               'max_s': max(times), 'runs': repeat, 'calls_per_run': 1}}
+
+
+def git_revision():
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        return result.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MacBookHelper hot paths")
+    parser.add_argument("--sizes", default="100,1000,10000,100000",
+                        help="comma-separated task/archive sizes (up to 1000000)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--archive-backend", default="json", choices=["json", "sqlite"])
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer().start()
+    report = {
+        'revision': git_revision(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'archive_backend': args.archive_backend,
+        'repeat': args.repeat,
+        'results': {}
+    }
+    try:
+        print("Benchmarking startup...", file=sys.stderr)
+        report['results']['startup'] = bench_startup(args.repeat)
+        for size in (int(size) for size in args.sizes.split(",")):
+            print(f"Benchmarking {size} tasks...", file=sys.stderr)
+            report['results'][str(size)] = bench_size(size, args.repeat, server.url,
+                                                      args.archive_backend)
+    finally:
+        server.stop()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
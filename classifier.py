@@ -0,0 +1,196 @@
+import heapq
+import sys
+import time
+from collections import Counter
+from itertools import chain, islice
+from math import log
+from threading import Lock
+
+from titles import is_fallback_title, normalize_title, shingles
+
+# A local model of the titles accepted so far, asked before OpenAI. Every
+# accepted title is an example: the words and word pairs of its
+# normalized window title, its app, and the title. A new window is given
+# the title its nearest examples from the same app agree on, found
+# through an inverted index from (app, word) to examples, so a prediction
+# costs microseconds and learning one example a few more.
+
+# IDF of a shingle found in a tenth of an app's examples: it and anything
+# rarer get full weight
+RARE_IDF = log(10)
+
+
+class TitleClassifier:
+    # k-nearest-neighbor classifier over window title shingles. Neighbors
+    # are the k examples of the same app with the highest weighted Jaccard
+    # similarity, each shingle weighted by its inverse document frequency
+    # among that app's examples, so parts every title of the app shares
+    # (" - Gmail", an account name) count for little and the words that
+    # tell windows apart for a lot. Each neighbor votes for its title with
+    # its similarity. The confidence of the winning title is the chance
+    # that at least one of its voters is right (1 - product of
+    # (1 - similarity)), scaled by its share of the vote, so several close
+    # examples that agree score high and neighbors that disagree score low.
+    #
+    # classify() only answers at or above `threshold` (0 turns it off), and
+    # only when at least min_agree neighbors vote for the title: one
+    # similar-looking window is not enough to skip OpenAI.
+    # At most max_examples windows are kept, the oldest dropped first.
+    # Candidates are the examples sharing the most words of at least half
+    # weight with the window; each word brings in at most its max_postings
+    # most recent examples, so common words ("inbox", "google docs") cost
+    # no more than rare ones.
+
+    def __init__(self, threshold=0.6, k=5, max_examples=20000, max_postings=50, min_agree=2):
+        self.threshold = threshold
+        self.k = k
+        self.max_examples = max_examples
+        self.max_postings = max_postings
+        self.min_agree = min_agree
+        self.lock = Lock()
+        self.examples = {}  # (app, normalized window) -> (shingles, title)
+        self.index = {}     # (app, shingle) -> {example key: None}
+        self.app_sizes = Counter()  # app -> number of examples
+        self.predictions = 0
+        self.hits = 0
+        self.learned = 0
+        self.seconds = 0.0
+
+    def __len__(self):
+        return len(self.examples)
+
+    # Training
+
+    def learn(self, app_name, window_name, title):
+        # Add or replace the example for this window
+        normalized = normalize_title(window_name)
+        with self.lock:
+            self._add((app_name, normalized), shingles(normalized), sys.intern(title))
+            while len(self.examples) > self.max_examples:
+                self._remove(next(iter(self.examples)))
+            self.learned += 1
+
+    def train(self, tasks):
+        # Bootstrap from tasks, newest first: fallback titles are skipped,
+        # windows already known keep their example, and training stops
+        # once the model is full. Returns the number of examples added.
+        found = {}
+        for task in tasks:
+            if len(found) + len(self.examples) >= self.max_examples:
+                break
+            if is_fallback_title(task):
+                continue
+            key = (task['app_name'], normalize_title(task['window_name']))
+            if key not in found and key not in self.examples:
+                found[key] = task['text']
+
+        # Oldest first, so they are also the first to go
+        added = 0
+        with self.lock:
+            for key, title in reversed(list(found.items())):
+                if key not in self.examples and len(self.examples) < self.max_examples:
+                    self._add(key, shingles(key[1]), sys.intern(title))
+                    added += 1
+        return added
+
+    def _add(self, key, words, title):
+        self._remove(key)
+        self.examples[key] = (words, title)
+        app_name = key[0]
+        self.app_sizes[app_name] += 1
+        for word in words:
+            self.index.setdefault((app_name, word), {})[key] = None
+
+    def _remove(self, key):
+        example = self.examples.pop(key, None)
+        if example is None:
+            return
+        self.app_sizes[key[0]] -= 1
+        if not self.app_sizes[key[0]]:
+            del self.app_sizes[key[0]]
+        for word in example[0]:
+            postings = self.index[(key[0], word)]
+            del postings[key]
+            if not postings:
+                del self.index[(key[0], word)]
+
+    # Prediction
+
+    def predict(self, app_name, window_name):
+        # (title, confidence) for the best title, or None unless at least
+        # min_agree neighbors vote for it
+        words = shingles(normalize_title(window_name))
+        index = self.index
+        limit = self.max_postings
+        with self.lock:
+            size = self.app_sizes[app_name]
+            if not size:
+                return None
+
+            # Weight of a shingle: its IDF, log((1 + examples) / (1 +
+            # examples with it)), relative to that of a shingle in a tenth
+            # of the examples and capped at 1. Shingles in every example of
+            # the app weigh nothing, rarer ones count as in plain Jaccard
+            # (so an app needs a handful of examples before any counts).
+            def weight(word):
+                postings = index.get((app_name, word))
+                idf = log((1 + size) / (1 + (len(postings) if postings else 0)))
+                return min(1.0, idf / RARE_IDF)
+
+            weights = {word: weight(word) for word in words}
+            shared = Counter(chain.from_iterable(
+                islice(reversed(index[(app_name, word)]), limit)
+                for word, w in weights.items() if w >= 0.5 and (app_name, word) in index))
+            if not shared:
+                return None
+
+            # Exact weighted similarity for the examples sharing the most
+            # informative words
+            examples = self.examples
+            total_weight = sum(weights.values())
+            neighbors = []
+            for key, _ in shared.most_common(self.k * 2):
+                other, title = examples[key]
+                both = sum(map(weights.__getitem__, words & other))
+                union = total_weight + sum(map(weight, other - words))
+                neighbors.append((both / union if union else 0.0, title))
+            neighbors = heapq.nlargest(self.k, neighbors)
+
+        votes = {}
+        voters = {}
+        doubt = {}
+        total = 0.0
+        for similarity, title in neighbors:
+            votes[title] = votes.get(title, 0.0) + similarity
+            voters[title] = voters.get(title, 0) + 1
+            doubt[title] = doubt.get(title, 1.0) * (1.0 - similarity)
+            total += similarity
+        if not total:
+            return None
+        title = max(votes, key=votes.get)
+        if voters[title] < self.min_agree:
+            return None
+        return title, (1.0 - doubt[title]) * votes[title] / total
+
+    def classify(self, app_name, window_name):
+        # A title if the model is confident enough, otherwise None
+        if not self.threshold:
+            return None
+        started = time.perf_counter()
+        prediction = self.predict(app_name, window_name)
+        self.seconds += time.perf_counter() - started
+        self.predictions += 1
+        if prediction is None or prediction[1] < self.threshold:
+            return None
+        self.hits += 1
+        return prediction[0]
+
+    def stats(self):
+        return {
+            'size': len(self.examples),
+            'learned': self.learned,
+            'predictions': self.predictions,
+            'hits': self.hits,
+            'hit_rate': self.hits / self.predictions if self.predictions else 0.0,
+            'avg_us': self.seconds / self.predictions * 1e6 if self.predictions else 0.0
+        }
@@ -0,0 +1,269 @@
+import argparse
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+from threading import Lock, Thread
+
+from journal import to_json
+from tracker import Tracker
+
+# Runs the tracker without a window and serves a small JSON API over a Unix
+# socket, so tracking can go on all day and the Tk window (or a script)
+# attaches only when needed.
+#
+#   python daemon.py                 # start tracking in the foreground
+#   python daemon.py status          # ask a running daemon
+#   python daemon.py add             # add a task for the current window
+#   python daemon.py stop
+#
+# Protocol: one JSON object per line in each direction. A request is
+# {"cmd": <name>, "args": {...}}, the reply {"ok": true, "result": ...} or
+# {"ok": false, "error": "..."}. Commands are those in tracker.API.
+
+
+def socket_path():
+    return os.environ.get("HELPER_SOCKET", "helper.sock")
+
+
+class TrackerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, tracker, path):
+        self.tracker = tracker
+        super().__init__(path, RequestHandler)
+        # Only the user running the daemon may talk to it
+        os.chmod(path, 0o600)
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        # Connections stay open for as many requests as the client sends
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                result = self.server.tracker.call(request['cmd'], **request.get('args', {}))
+                reply = {'ok': True, 'result': result}
+            except Exception as e:
+                reply = {'ok': False, 'error': str(e) or type(e).__name__}
+            self.wfile.write((json.dumps(reply, default=to_json) + "\n").encode())
+            self.wfile.flush()
+
+
+class TrackerClient:
+    # Connection to a running daemon; reconnects after the daemon restarts
+
+    def __init__(self, path=None, timeout=30):
+        self.path = path or socket_path()
+        self.timeout = timeout
+        self.lock = Lock()
+        self.sock = None
+        self.file = None
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        try:
+            self.sock.connect(self.path)
+        except OSError:
+            self.sock.close()
+            self.sock = None
+            raise
+        self.file = self.sock.makefile('rwb')
+        return self
+
+    def call(self, cmd, **args):
+        with self.lock:
+            if self.sock is None:
+                self.connect()
+            try:
+                self.file.write((json.dumps({'cmd': cmd, 'args': args}) + "\n").encode())
+                self.file.flush()
+                line = self.file.readline()
+            except OSError:
+                self.close()
+                raise
+            if not line:
+                self.close()
+                raise ConnectionError("tracker daemon closed the connection")
+        reply = json.loads(line)
+        if not reply['ok']:
+            raise RuntimeError(reply['error'])
+        return reply['result']
+
+    def close(self):
+        if self.sock is not None:
+            self.file.close()
+            self.sock.close()
+            self.sock = None
+            self.file = None
+
+
+class TaskSnapshot:
+    # Read-only copy of a daemon's tasks, with the parts of TaskStore the
+    # GUI reads
+
+    def __init__(self):
+        self.items = []
+        self.by_id = {}
+        self.completed = 0
+        self.version = None
+
+    def replace(self, items, version):
+        self.items = items
+        self.by_id = {task['id']: task for task in items}
+        self.completed = sum(1 for task in items if task['completed'])
+        self.version = version
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, task_id):
+        return self.by_id.get(task_id)
+
+    @property
+    def active(self):
+        return len(self.items) - self.completed
+
+
+class RemoteTracker:
+    # Stands in for a Tracker inside the GUI when a daemon is running:
+    # commands go over the socket, tasks are synced on each tick
+
+    def __init__(self, client):
+        self.client = client
+        self.tasks = TaskSnapshot()
+        self.session = None
+        self.paused = False
+        self.connected = True
+
+    def start(self):
+        return self
+
+    def preload_archive(self):
+        pass
+
+    def tick(self):
+        try:
+            status = self.client.call('status')
+            self.paused = status['tracking'] == "paused"
+            version = (status['session'], status['version'])
+            if version != self.tasks.version:
+                since = self.tasks.version[1] if status['session'] == self.session else None
+                snapshot = self.client.call('snapshot', since=since)
+                if snapshot['tasks'] is not None:
+                    self.tasks.replace(snapshot['tasks'], (status['session'], snapshot['version']))
+                self.session = status['session']
+            if not self.connected:
+                print("Reconnected to tracker daemon")
+                self.connected = True
+        except (OSError, RuntimeError) as e:
+            if self.connected:
+                print(f"Lost connection to tracker daemon: {e}")
+                self.connected = False
+
+    def command(self, cmd, **args):
+        try:
+            return self.client.call(cmd, **args)
+        except (OSError, RuntimeError) as e:
+            print(f"Error sending {cmd} to tracker daemon: {e}")
+            return None
+
+    def add_task(self):
+        return self.command('add_task')
+
+    def toggle_task(self, task_id):
+        return self.command('toggle_task', task_id=task_id)
+
+    def delete_task(self, task_id):
+        return self.command('delete_task', task_id=task_id)
+
+    def clear_completed(self):
+        return self.command('clear_completed')
+
+    def archive_all(self):
+        return self.command('archive_all')
+
+    def stats(self):
+        return self.command('stats')
+
+    def close(self):
+        self.client.close()
+
+
+def connect_tracker(path=None):
+    # A RemoteTracker if a daemon answers on the socket, otherwise None
+    path = path or socket_path()
+    if not os.path.exists(path):
+        return None
+    try:
+        return RemoteTracker(TrackerClient(path).connect())
+    except OSError:
+        return None
+
+
+def serve(path):
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    if connect_tracker(path) is not None:
+        print(f"A tracker daemon is already listening on {path}")
+        return 1
+    if os.path.exists(path):
+        # Left behind by a daemon that did not shut down cleanly
+        os.unlink(path)
+
+    tracker = Tracker().start()
+    tracker.preload_archive()
+    server = TrackerServer(tracker, path)
+    Thread(target=server.serve_forever, daemon=True).start()
+
+    # Finish the current event and shut down cleanly on Ctrl-C or SIGTERM
+    signal.signal(signal.SIGTERM, lambda *args: tracker.stop())
+    signal.signal(signal.SIGINT, lambda *args: tracker.stop())
+    print(f"Tracking; listening on {path}", file=sys.stderr)
+    try:
+        tracker.run()
+    finally:
+        server.shutdown()
+        server.server_close()
+        os.unlink(path)
+        tracker.close()
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless MacBook Helper tracker")
+    parser.add_argument("command", nargs="?", default="serve",
+                        choices=["serve", "status", "add", "tasks", "stop"])
+    parser.add_argument("--socket", default=socket_path(),
+                        help="Unix socket path (default: $HELPER_SOCKET or helper.sock)")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        return serve(args.socket)
+
+    client = TrackerClient(args.socket)
+    try:
+        if args.command == "status":
+            result = client.call('status')
+        elif args.command == "add":
+            result = client.call('add_task')
+        elif args.command == "tasks":
+            result = client.call('snapshot')['tasks']
+        else:
+            result = client.call('shutdown')
+    except OSError as e:
+        print(f"No tracker daemon on {args.socket}: {e}")
+        return 1
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
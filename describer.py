@@ -0,0 +1,62 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+
+class DescriptionPipeline:
+    # Runs description requests on a small worker pool so the Tk thread
+    # never waits on the network. Requests for a key that is already in
+    # flight share the same future instead of issuing a second call.
+    # Each call gets a timeout and is retried with exponential backoff.
+
+    def __init__(self, fetch, max_workers=4, timeout=15.0, retries=2, backoff=0.5):
+        # fetch(app_name, window_name, timeout) returns the description or raises
+        self.fetch = fetch
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix="describer")
+        self.lock = Lock()
+        self.in_flight = {}  # key -> Future
+        self.requests = 0
+        self.coalesced = 0
+        self.failures = 0
+
+    def submit(self, key, app_name, window_name):
+        with self.lock:
+            future = self.in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+            future = self.executor.submit(self._run, app_name, window_name)
+            self.in_flight[key] = future
+            self.requests += 1
+        # Registered outside the lock: it runs right away if already done
+        future.add_done_callback(lambda done: self._finish(key, done))
+        return future
+
+    def _finish(self, key, future):
+        with self.lock:
+            if self.in_flight.get(key) is future:
+                del self.in_flight[key]
+            if future.cancelled() or future.exception() is not None:
+                self.failures += 1
+
+    def _run(self, app_name, window_name):
+        delay = self.backoff
+        for attempt in range(self.retries + 1):
+            try:
+                return self.fetch(app_name, window_name, self.timeout)
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                time.sleep(delay)
+                delay *= 2
+
+    def pending(self):
+        with self.lock:
+            return len(self.in_flight)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,155 @@
+import sqlite3
+import time
+from threading import Lock
+
+from titles import NearDuplicateIndex, normalize_title
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS descriptions (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS descriptions_last_used ON descriptions (last_used);
+"""
+
+
+class DescriptionCache:
+    # Persistent cache of generated task descriptions keyed by "app:window".
+    # Entries live in a small SQLite file so they survive restarts. The
+    # cache holds at most max_entries (least recently used entries are
+    # evicted first) and entries older than ttl seconds are treated as
+    # misses. The database is only opened on first use.
+    #
+    # get_similar() finds an entry for a near-identical title of the same
+    # app (Jaccard similarity of at least `similarity`, 0 turns it off).
+    # Its index over the cached keys is built on the first such lookup.
+
+    def __init__(self, path, max_entries=5000, ttl=30 * 24 * 3600, similarity=0.8):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self.lock = Lock()
+        self.conn = None
+        self.index = None
+        self.size = 0
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _connect(self):
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(SCHEMA)
+            self.size = self.conn.execute("SELECT COUNT(*) FROM descriptions").fetchone()[0]
+        return self.conn
+
+    def get(self, key):
+        with self.lock:
+            value = self._lookup(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def get_similar(self, key):
+        # (cached key, value) for the most similar key, or None
+        if not self.similarity:
+            return None
+        app_name, _, title = key.partition(":")
+        with self.lock:
+            similar = self._similar_keys().query(app_name, normalize_title(title))
+            if similar is None or similar == key:
+                return None
+            value = self._lookup(similar)
+            if value is None:
+                return None
+            self.near_hits += 1
+            return similar, value
+
+    def _lookup(self, key):
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute("SELECT value, created_at FROM descriptions WHERE key = ?",
+                           (key,)).fetchone()
+        if row is None:
+            return None
+
+        value, created_at = row
+        with conn:
+            if now - created_at > self.ttl:
+                conn.execute("DELETE FROM descriptions WHERE key = ?", (key,))
+                self.size -= 1
+                self.expirations += 1
+                if self.index is not None:
+                    self.index.discard(key)
+                return None
+            conn.execute("UPDATE descriptions SET last_used = ? WHERE key = ?", (now, key))
+        return value
+
+    def _similar_keys(self):
+        if self.index is None:
+            self.index = NearDuplicateIndex(self.similarity)
+            for (key,) in self._connect().execute("SELECT key FROM descriptions"):
+                self._index_key(key)
+        return self.index
+
+    def _index_key(self, key):
+        app_name, _, title = key.partition(":")
+        self.index.add(key, app_name, normalize_title(title))
+
+    def put(self, key, value):
+        now = time.time()
+        with self.lock:
+            conn = self._connect()
+            with conn:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO descriptions (key, value, created_at, last_used) "
+                    "VALUES (?, ?, ?, ?)", (key, value, now, now))
+                if cursor.rowcount:
+                    self.size += 1
+                else:
+                    conn.execute("UPDATE descriptions SET value = ?, created_at = ?, last_used = ? "
+                                 "WHERE key = ?", (value, now, now, key))
+
+                if self.index is not None:
+                    self._index_key(key)
+
+                # Evict least recently used entries beyond the size limit
+                excess = self.size - self.max_entries
+                if excess > 0:
+                    evicted = [row[0] for row in conn.execute(
+                        "SELECT key FROM descriptions ORDER BY last_used LIMIT ?", (excess,))]
+                    conn.executemany("DELETE FROM descriptions WHERE key = ?",
+                                     [(evicted_key,) for evicted_key in evicted])
+                    self.size -= len(evicted)
+                    self.evictions += len(evicted)
+                    if self.index is not None:
+                        for evicted_key in evicted:
+                            self.index.discard(evicted_key)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': self.size,
+            'hits': self.hits,
+            'near_hits': self.near_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            # Near hits are misses of get() answered by get_similar()
+            'hit_rate': (self.hits + self.near_hits) / lookups if lookups else 0.0
+        }
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
@@ -0,0 +1,320 @@
+import argparse
+import csv
+import heapq
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+from itertools import chain
+
+from archive_db import ArchiveDB
+from journal import iter_items
+from task_tree import group_key, task_type
+
+# Streaming export of tasks and archive to CSV, JSON Lines and iCalendar,
+# plus per-day summaries grouped like the task tree. Tasks are read one at
+# a time and sorted with an external merge sort, so memory stays flat no
+# matter how large the archive grows.
+#
+#   python export.py tasks --format ics --start 2025-01-01 --end 2025-02-01 -o january.ics
+#   python export.py summary --by type --start 2025-01-06
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+CSV_FIELDS = ('start', 'end', 'duration_seconds', 'text', 'type', 'app_name',
+              'window_name', 'completed', 'auto_tracked', 'id')
+
+
+# Reading
+
+def iter_tasks(start=None, end=None, sources=("tasks", "archive"), tasks_file="tasks.json",
+               archive_file="archive.json", archive_backend=None, chunk_size=100000):
+    # Tasks created in [start, end) from the given sources, oldest first.
+    # start and end are "YYYY-MM-DD[ HH:MM:SS]" strings (or None).
+    streams = []
+    if "tasks" in sources:
+        streams.append(in_range(iter_items(tasks_file), start, end))
+    if "archive" in sources:
+        streams.append(iter_archive(archive_file, start, end, archive_backend))
+    return dedupe(sorted_by_time(chain(*streams), chunk_size))
+
+
+def iter_archive(archive_file, start, end, backend=None):
+    # Read-only: with the sqlite backend, a database that doesn't exist or
+    # is still empty is read as the JSON archive it would be migrated from
+    # (see open_archive_store), and no database file is created
+    backend = backend or os.environ.get("ARCHIVE_BACKEND", "json")
+    db_path = os.path.splitext(archive_file)[0] + ".db"
+    if backend == "sqlite" and os.path.exists(db_path):
+        db = ArchiveDB(db_path)
+        try:
+            if db.count():
+                yield from db.iter_tasks(start=start, end=end)
+                return
+        finally:
+            db.close()
+    yield from in_range(iter_items(archive_file), start, end)
+
+
+def in_range(tasks, start, end):
+    # created_at sorts as text, so plain string comparison is enough
+    for task in tasks:
+        created_at = task['created_at']
+        if (start is None or created_at >= start) and (end is None or created_at < end):
+            yield task
+
+
+def sorted_by_time(tasks, chunk_size=100000):
+    # External merge sort on created_at: runs of chunk_size tasks are
+    # sorted in memory and, if there is more than one, spilled to
+    # temporary files and merged
+    key = lambda task: task['created_at']
+    chunk = []
+    runs = []
+    try:
+        for task in tasks:
+            chunk.append(task)
+            if len(chunk) >= chunk_size:
+                runs.append(spill(sorted(chunk, key=key)))
+                chunk = []
+        chunk.sort(key=key)
+        if not runs:
+            yield from chunk
+            return
+        runs.append(spill(chunk))
+        chunk = []
+        yield from heapq.merge(*[(json.loads(line) for line in run) for run in runs], key=key)
+    finally:
+        for run in runs:
+            run.close()
+
+
+def spill(tasks):
+    run = tempfile.TemporaryFile('w+')
+    for task in tasks:
+        run.write(json.dumps(task) + "\n")
+    run.seek(0)
+    return run
+
+
+def dedupe(tasks):
+    # A completed task can be in tasks.json and the archive at once, or be
+    # archived twice. Copies share created_at, so only tasks within the
+    # current second need remembering; the first copy (tasks.json) wins.
+    current = None
+    seen = set()
+    for task in tasks:
+        if task['created_at'] != current:
+            current = task['created_at']
+            seen.clear()
+        key = (task.get('id'), task['app_name'], task['window_name'])
+        if key in seen:
+            continue
+        seen.add(key)
+        yield task
+
+
+def with_durations(tasks, max_gap=30 * 60):
+    # (task, start, seconds): each task lasts until the next one starts,
+    # at most max_gap seconds (longer gaps are breaks). The last task has
+    # no successor and gets 0.
+    previous = None
+    for task in tasks:
+        started = datetime.strptime(task['created_at'], TIME_FORMAT)
+        if previous is not None:
+            seconds = (started - previous[1]).total_seconds()
+            yield previous[0], previous[1], int(min(seconds, max_gap))
+        previous = (task, started)
+    if previous is not None:
+        yield previous[0], previous[1], 0
+
+
+# Writing
+
+def write_csv(rows, out):
+    writer = csv.writer(out)
+    writer.writerow(CSV_FIELDS)
+    count = 0
+    for task, started, seconds in rows:
+        writer.writerow([started.strftime(TIME_FORMAT), end_time(started, seconds),
+                         seconds, task['text'], task_type(task), task['app_name'],
+                         task['window_name'], task['completed'], task.get('auto_tracked', False),
+                         task.get('id', "")])
+        count += 1
+    return count
+
+
+def write_jsonl(rows, out):
+    count = 0
+    for task, started, seconds in rows:
+        record = dict(task, type=task_type(task), start=started.strftime(TIME_FORMAT),
+                      end=end_time(started, seconds), duration_seconds=seconds)
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+
+def write_ics(rows, out):
+    # One VEVENT per task, in floating local time like created_at
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    ics_line(out, "BEGIN:VCALENDAR")
+    ics_line(out, "VERSION:2.0")
+    ics_line(out, "PRODID:-//MacBook Helper//Task export//EN")
+    count = 0
+    for task, started, seconds in rows:
+        start = started.strftime("%Y%m%dT%H%M%S")
+        ics_line(out, "BEGIN:VEVENT")
+        ics_line(out, f"UID:{task.get('id', count)}-{start}@macbook-helper")
+        ics_line(out, f"DTSTAMP:{stamp}")
+        ics_line(out, f"DTSTART:{start}")
+        ics_line(out, f"DURATION:PT{seconds}S")
+        ics_line(out, f"SUMMARY:{ics_escape(task['text'])}")
+        ics_line(out, f"DESCRIPTION:{ics_escape(task['app_name'] + ' — ' + task['window_name'])}")
+        ics_line(out, f"CATEGORIES:{ics_escape(task_type(task))}")
+        ics_line(out, "END:VEVENT")
+        count += 1
+    ics_line(out, "END:VCALENDAR")
+    return count
+
+
+def ics_escape(text):
+    return (text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def ics_line(out, line):
+    # Fold content lines at 75 octets without splitting a UTF-8 character
+    parts = []
+    current = ""
+    size = 0
+    for char in line:
+        width = len(char.encode('utf-8'))
+        if size + width > (75 if not parts else 74):
+            parts.append(current)
+            current = ""
+            size = 0
+        current += char
+        size += width
+    parts.append(current)
+    out.write("\r\n ".join(parts) + "\r\n")
+
+
+def end_time(started, seconds):
+    return (started + timedelta(seconds=seconds)).strftime(TIME_FORMAT)
+
+
+WRITERS = {'csv': write_csv, 'jsonl': write_jsonl, 'ics': write_ics}
+
+
+# Daily summaries
+
+def daily_summaries(rows, org_method="Type"):
+    # One summary per day: time and task count per group, with groups in
+    # order of first appearance as in the task tree. Only one day is held
+    # in memory at a time.
+    day = None
+    groups = {}
+    for task, started, seconds in rows:
+        date = started.strftime("%Y-%m-%d")
+        if date != day:
+            if day is not None:
+                yield summary(day, groups)
+            day = date
+            groups = {}
+        group = groups.setdefault(group_key(task, org_method), [0, 0])
+        group[0] += 1
+        group[1] += seconds
+    if day is not None:
+        yield summary(day, groups)
+
+
+def summary(day, groups):
+    return {
+        'date': day,
+        'tasks': sum(count for count, _ in groups.values()),
+        'seconds': sum(seconds for _, seconds in groups.values()),
+        'groups': [{'group': list(path), 'tasks': count, 'seconds': seconds}
+                   for path, (count, seconds) in groups.items()]
+    }
+
+
+def write_summaries(summaries, out, fmt):
+    count = 0
+    if fmt == 'csv':
+        writer = csv.writer(out)
+        writer.writerow(('date', 'group', 'tasks', 'seconds'))
+    for day in summaries:
+        count += 1
+        if fmt == 'jsonl':
+            out.write(json.dumps(day, ensure_ascii=False) + "\n")
+        elif fmt == 'csv':
+            for group in day['groups']:
+                writer.writerow((day['date'], " / ".join(group['group']), group['tasks'],
+                                 group['seconds']))
+        else:
+            out.write(f"{day['date']}  {day['tasks']} tasks, {format_duration(day['seconds'])}\n")
+            for group in day['groups']:
+                out.write(f"  {' / '.join(group['group']):<48}{group['tasks']:>5}"
+                          f"  {format_duration(group['seconds'])}\n")
+    return count
+
+
+def format_duration(seconds):
+    hours, minutes = divmod(seconds // 60, 60)
+    return f"{hours}h{minutes:02d}m" if hours else f"{minutes}m"
+
+
+# Command line
+
+def timestamp(value):
+    # argparse type for --start/--end: a date or a full created_at stamp
+    for fmt in ("%Y-%m-%d", TIME_FORMAT):
+        try:
+            datetime.strptime(value, fmt)
+            return value
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError(f"expected YYYY-MM-DD or '{TIME_FORMAT}', got {value!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export tracked tasks and daily summaries")
+    parser.add_argument("what", choices=["tasks", "summary"])
+    parser.add_argument("--format", choices=["csv", "jsonl", "ics", "text"],
+                        help="tasks: csv (default), jsonl or ics; summary: text (default), csv or jsonl")
+    parser.add_argument("--start", type=timestamp, help="first day (inclusive)")
+    parser.add_argument("--end", type=timestamp, help="last day (exclusive)")
+    parser.add_argument("--source", choices=["all", "tasks", "archive"], default="all")
+    parser.add_argument("--by", choices=["type", "app"], default="type",
+                        help="summary grouping, as in the task tree")
+    parser.add_argument("--max-gap", type=float, default=30,
+                        help="minutes after which a gap between tasks counts as a break")
+    parser.add_argument("--tasks-file", default="tasks.json")
+    parser.add_argument("--archive-file", default="archive.json")
+    parser.add_argument("-o", "--output", help="write here instead of stdout")
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.what == "tasks" else "text")
+    if (args.what == "tasks" and fmt == "text") or (args.what == "summary" and fmt == "ics"):
+        parser.error(f"--format {fmt} is not available for {args.what}")
+
+    sources = ("tasks", "archive") if args.source == "all" else (args.source,)
+    tasks = iter_tasks(args.start, args.end, sources, args.tasks_file, args.archive_file)
+    rows = with_durations(tasks, max_gap=args.max_gap * 60)
+
+    # ICS needs CRLF line endings untouched, so no newline translation
+    out = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        if args.what == "tasks":
+            count = WRITERS[fmt](rows, out)
+        else:
+            org_method = "Type" if args.by == "type" else "Application"
+            count = write_summaries(daily_summaries(rows, org_method), out, fmt)
+    finally:
+        if args.output:
+            out.close()
+    print(f"Exported {count} {'tasks' if args.what == 'tasks' else 'days'}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
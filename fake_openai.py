@@ -0,0 +1,127 @@
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+
+
+def default_responder(messages):
+    # Echo a short, recognizable title built from the window named in the
+    # tracker's prompt ("... the window/tab is '<window>', ...")
+    prompt = messages[-1]['content'] if messages else ""
+    marker = "window/tab is '"
+    start = prompt.find(marker)
+    end = prompt.find("',", start + len(marker)) if start >= 0 else -1
+    if end >= 0:
+        window = prompt[start + len(marker):end]
+    else:
+        window = prompt[:40]
+    return f"🧪 Working on {window}"
+
+
+def default_json_responder(messages):
+    # JSON mode (response_format json_object), as relabel.py uses it: the
+    # prompt ends in a JSON list of {"id", "app", "window"} entries
+    prompt = messages[-1]['content'] if messages else ""
+    entries = json.loads(prompt[prompt.rindex("\n\n") + 2:]) if "\n\n[" in prompt else []
+    return json.dumps({'titles': {entry['id']: f"🧪 Working on {entry['window']}"
+                                  for entry in entries}}, ensure_ascii=False)
+
+
+class FakeOpenAIServer:
+    # Minimal local stand-in for the OpenAI chat completions API, for
+    # exercising the description pipeline without network access. Point
+    # the client at it with OPENAI_BASE_URL=<server.url>.
+    #
+    # delay simulates a slow round trip, and the first fail_first requests
+    # answer with HTTP 500 to exercise retries. Requests in JSON mode are
+    # answered by json_responder.
+
+    def __init__(self, host="127.0.0.1", port=0, delay=0.0, fail_first=0, responder=None,
+                 json_responder=None):
+        self.delay = delay
+        self.fail_first = fail_first
+        self.responder = responder or default_responder
+        self.json_responder = json_responder or default_json_responder
+        self.lock = Lock()
+        self.requests = []
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self.thread = Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                with fake.lock:
+                    fake.requests.append(body)
+                    count = len(fake.requests)
+
+                if fake.delay:
+                    time.sleep(fake.delay)
+                if not self.path.endswith("/chat/completions"):
+                    return self._reply(404, {'error': {'message': 'not found'}})
+                if count <= fake.fail_first:
+                    return self._reply(500, {'error': {'message': 'injected failure'}})
+
+                if (body.get('response_format') or {}).get('type') == 'json_object':
+                    content = fake.json_responder(body.get('messages', []))
+                else:
+                    content = fake.responder(body.get('messages', []))
+                self._reply(200, {
+                    'id': f"chatcmpl-fake-{count}",
+                    'object': 'chat.completion',
+                    'created': int(time.time()),
+                    'model': body.get('model', 'fake'),
+                    'choices': [{
+                        'index': 0,
+                        'message': {'role': 'assistant', 'content': content},
+                        'finish_reason': 'stop'
+                    }],
+                    'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+                })
+
+            def _reply(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fake OpenAI-compatible server")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--delay", type=float, default=0.0)
+    parser.add_argument("--fail-first", type=int, default=0)
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(port=args.port, delay=args.delay, fail_first=args.fail_first)
+    print(f"Fake OpenAI server on {server.url} (set OPENAI_BASE_URL to this)")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        server.server.server_close()
@@ -0,0 +1,349 @@
+import hashlib
+import json
+import os
+from threading import Lock
+
+from metrics import METRICS
+from persistence import WRITER
+
+
+class JournalStore:
+    # Append-only storage for a JSON list such as tasks.json.
+    #
+    # The JSON file itself is the snapshot and keeps its original format.
+    # Every mutation is appended to "<path>.journal" as one JSON line, so a
+    # change costs O(1) instead of rewriting the whole list. Once enough
+    # records pile up, the snapshot is rewritten atomically and the journal
+    # starts over.
+    #
+    # Nothing is written on the caller's thread: lines and snapshots are
+    # collected here and written by a WriteBehind writer (the shared one
+    # by default) shortly after the last change. A burst of changes is one
+    # write and one fsync, and a snapshot replaces the lines before it.
+    #
+    # The first journal line records a digest of the snapshot it applies
+    # to. If we crash between replacing the snapshot and starting the new
+    # journal, the digests no longer match and the stale journal (whose
+    # records are already in the snapshot) is ignored on replay, apart
+    # from its meta.
+    #
+    # With a record type (such as TaskRecord), items are kept in memory as
+    # record.from_dict(item) and written back through to_dict().
+    #
+    # meta is a small dict stored alongside the list (in the journal
+    # header, and as 'meta' records when set_meta() changes it), for state
+    # that is not in the items themselves.
+
+    def __init__(self, path, compact_every=500, record=None, writer=None):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.compact_every = compact_every
+        self.record = record
+        self.writer = writer or WRITER
+        self.items = []
+        self.meta = {}
+        self.pending = 0
+        self.loaded = False
+        # Not written yet; swapped out by the writer under self.lock
+        self.lock = Lock()
+        self.lines = []
+        self.snapshot = None
+        self.journal = None
+
+    def load(self):
+        # Already loaded and being written to: the in-memory list is current
+        if self.loaded:
+            return self.items
+
+        data = b""
+        if os.path.exists(self.path):
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        self.items = json.loads(data) if data else []
+        digest = hashlib.sha1(data).hexdigest()
+
+        clean = self._replay(digest)
+        if self.record is not None:
+            self.items[:] = map(self.record.from_dict, self.items)
+        self.loaded = True
+
+        # Start a fresh journal unless we can safely keep appending to this one
+        if not clean or self.pending >= self.compact_every:
+            self.compact()
+        return self.items
+
+    def _replay(self, digest):
+        if not os.path.exists(self.journal_path):
+            return False
+        with open(self.journal_path, 'r') as f:
+            lines = f.read().split("\n")
+
+        try:
+            header = json.loads(lines[0])
+        except ValueError:
+            return False
+        if header.get('op') != 'base':
+            return False
+        self.meta = header.get('meta', {})
+        if header.get('digest') != digest:
+            self._replay_meta(lines[1:])
+            return False
+
+        by_id = {item.get('id'): item for item in self.items}
+        for line in lines[1:]:
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Truncated tail from a crash mid-write
+                return False
+            self._apply(record, by_id)
+            self.pending += 1
+        return lines[-1] == ""
+
+    def _replay_meta(self, lines):
+        # A stale journal's items are in the snapshot, but its meta isn't:
+        # keep that, as it was when the snapshot was taken
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('op') == 'meta':
+                self.meta.update(record['fields'])
+
+    def _apply(self, record, by_id):
+        op = record['op']
+        if op == 'append':
+            self.items.append(record['task'])
+            by_id[record['task'].get('id')] = record['task']
+        elif op == 'extend':
+            self.items.extend(record['tasks'])
+            by_id.update((task.get('id'), task) for task in record['tasks'])
+        elif op == 'update':
+            by_id[record['id']].update(record['fields'])
+        elif op == 'remove':
+            removed = set(record['ids'])
+            self.items[:] = [item for item in self.items if item.get('id') not in removed]
+        elif op == 'meta':
+            self.meta.update(record['fields'])
+
+    # Mutations: each applies the change to self.items and journals it.
+    # update and remove refer to items by their 'id' field.
+
+    def append(self, task):
+        self.items.append(task)
+        self._log({'op': 'append', 'task': task})
+
+    def extend(self, tasks):
+        tasks = list(tasks)
+        if tasks:
+            self.items.extend(tasks)
+            self._log({'op': 'extend', 'tasks': tasks})
+
+    def update(self, item, **fields):
+        item.update(fields)
+        self._log({'op': 'update', 'id': item['id'], 'fields': fields})
+
+    def remove(self, ids):
+        removed = set(ids)
+        if removed:
+            self.items[:] = [item for item in self.items if item.get('id') not in removed]
+            self._log({'op': 'remove', 'ids': sorted(removed)})
+
+    def replace(self, tasks):
+        self.items[:] = list(tasks)
+        self.compact()
+
+    def set_meta(self, **fields):
+        self.meta.update(fields)
+        self._log({'op': 'meta', 'fields': fields})
+
+    def _log(self, record):
+        # Serialize now: the caller may keep mutating the task dicts
+        line = json.dumps(record, default=to_json)
+        with self.lock:
+            self.lines.append(line)
+        self.writer.mark(self._write)
+        self.pending += 1
+        if self.pending >= self.compact_every:
+            self.compact()
+
+    def compact(self):
+        # Copy the items so the writer sees them as they are right now. The
+        # new snapshot already holds the lines not written yet.
+        snapshot = ([item.copy() for item in self.items], dict(self.meta))
+        with self.lock:
+            self.snapshot = snapshot
+            self.lines = []
+        self.writer.mark(self._write)
+        self.pending = 0
+
+    def flush(self):
+        if self.loaded:
+            self.writer.flush()
+
+    def close(self):
+        if not self.loaded:
+            return
+        self.writer.flush()
+        with self.lock:
+            if self.journal:
+                self.journal.close()
+                self.journal = None
+        self.loaded = False
+
+    # Writing (on the writer's thread)
+
+    def _write(self):
+        # The latest snapshot, if any, then the lines logged after it
+        with self.lock:
+            snapshot, self.snapshot = self.snapshot, None
+            lines, self.lines = self.lines, []
+        if snapshot is not None:
+            self._write_snapshot(*snapshot)
+        self._write_lines(lines)
+
+    def _write_lines(self, lines):
+        if not lines:
+            return
+        timer = METRICS.timer("helper_journal_write_seconds",
+                              file=os.path.basename(self.path), kind="lines")
+        try:
+            with timer:
+                if self.journal is None:
+                    self.journal = open(self.journal_path, 'a')
+                self.journal.write("\n".join(lines) + "\n")
+                self.journal.flush()
+                os.fsync(self.journal.fileno())
+        except OSError as e:
+            print(f"Error writing journal {self.journal_path}: {e}")
+
+    def _write_snapshot(self, items, meta):
+        timer = METRICS.timer("helper_journal_write_seconds",
+                              file=os.path.basename(self.path), kind="snapshot")
+        try:
+            with timer:
+                data = json.dumps(items, default=to_json).encode()
+                atomic_write(self.path, data)
+
+                if self.journal:
+                    self.journal.close()
+                    self.journal = None
+                header = {'op': 'base', 'digest': hashlib.sha1(data).hexdigest()}
+                if meta:
+                    header['meta'] = meta
+                header = json.dumps(header)
+                atomic_write(self.journal_path, (header + "\n").encode())
+        except OSError as e:
+            print(f"Error writing snapshot {self.path}: {e}")
+
+
+def to_json(item):
+    # json.dumps fallback for record items
+    return item.to_dict()
+
+
+def iter_items(path):
+    # Stream the items of a journaled JSON list in order, without loading
+    # the snapshot into memory. Only the journal (at most compact_every
+    # records) is held, and applied to items as they go past.
+    journal_path = path + ".journal"
+    records = []
+    if os.path.exists(journal_path):
+        digest = hashlib.sha1()
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 16), b""):
+                    digest.update(chunk)
+        with open(journal_path, 'r') as f:
+            lines = f.read().split("\n")
+        try:
+            header = json.loads(lines[0])
+        except ValueError:
+            header = {}
+        # Same rules as JournalStore._replay: a journal for another
+        # snapshot is stale, and a truncated line ends the replay
+        if header.get('op') == 'base' and header.get('digest') == digest.hexdigest():
+            for line in lines[1:]:
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+
+    appended = []
+    for record in records:
+        if record['op'] == 'append':
+            appended.append(record['task'])
+        elif record['op'] == 'extend':
+            appended.extend(record['tasks'])
+    by_id = {item.get('id'): item for item in appended}
+    updates = {}
+    removed = set()
+    for record in records:
+        if record['op'] == 'update':
+            if record['id'] in by_id:
+                by_id[record['id']].update(record['fields'])
+            else:
+                updates.setdefault(record['id'], {}).update(record['fields'])
+        elif record['op'] == 'remove':
+            removed.update(record['ids'])
+
+    if os.path.exists(path):
+        for item in iter_json_array(path):
+            item_id = item.get('id')
+            if item_id in removed:
+                continue
+            if item_id in updates:
+                item.update(updates[item_id])
+            yield item
+    for item in appended:
+        if item.get('id') not in removed:
+            yield item
+
+
+def iter_json_array(path, chunk_size=1 << 16):
+    # Decode a JSON array of objects one element at a time
+    decoder = json.JSONDecoder()
+    with open(path, 'r') as f:
+        buffer = f.read(chunk_size)
+        pos = buffer.find('[')
+        if pos < 0:
+            return
+        pos += 1
+        eof = False
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buffer) and buffer[pos] == ']':
+                return
+            try:
+                if pos >= len(buffer):
+                    raise ValueError
+                item, pos = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                # Element runs past the buffer: read more and try again
+                if eof:
+                    raise
+                more = f.read(chunk_size)
+                eof = not more
+                buffer = buffer[pos:] + more
+                pos = 0
+                if eof and not buffer:
+                    return
+                continue
+            yield item
+
+
+def atomic_write(path, data):
+    # Write to a temp file and rename it over the target, so readers only
+    # ever see the old or the new contents, never a truncated file
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
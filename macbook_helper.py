@@ -1,57 +1,37 @@
+import time
+IMPORT_STARTED = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk
-import json
 import os
-from datetime import datetime
-import psutil
-import time
-from threading import Thread
-import subprocess
-import openai
-from dotenv import load_dotenv
+import sys
+from task_tree import TaskTreeRenderer, group_key
+from tracker import Tracker
+from daemon import connect_tracker
+from metrics import METRICS, enabled_from_env
+
+# openai and dotenv are imported where they are first needed, so the window
+# does not wait for them
+IMPORT_TIME = time.perf_counter() - IMPORT_STARTED
 
 class MacBookHelper:
     def __init__(self):
+        init_started = time.perf_counter()
+        self.startup_timing = {'imports': IMPORT_TIME}
+        
         # Load environment variables
+        from dotenv import load_dotenv
         load_dotenv()
         
-        # Initialize OpenAI client once
-        self.openai_client = openai.OpenAI()
-        
-        # Cache for task descriptions
-        self.description_cache = {}
-        
-        # Common window patterns and their descriptions
-        self.common_patterns = {
-            # Email patterns
-            "Inbox": "📧 Checking new messages",
-            "Draft": "📧 Composing email",
-            "Sent": "📧 Reviewing sent items",
-            "Calendar": "📅 Managing calendar",
-            
-            # Browser patterns
-            "mail.google.com": "📧 Using Gmail",
-            "calendar.google.com": "📅 Using Calendar",
-            "docs.google.com": "📝 Using Google Docs",
-            "sheets.google.com": "📊 Using Google Sheets",
-            "meet.google.com": "🎥 In Google Meet",
-            
-            # Document patterns
-            ".doc": "📝 Editing document",
-            ".docx": "📝 Editing document",
-            ".xls": "📊 Working on spreadsheet",
-            ".xlsx": "📊 Working on spreadsheet",
-            ".ppt": "📊 Working on presentation",
-            ".pptx": "📊 Working on presentation",
-            ".pdf": "📄 Viewing document",
-            
-            # Development patterns
-            ".py": "💻 Writing Python code",
-            ".js": "💻 Writing JavaScript code",
-            ".html": "💻 Writing HTML",
-            ".css": "💻 Writing CSS",
-            ".md": "📝 Writing documentation"
-        }
+        # Latency histograms and counters, off unless asked for
+        METRICS.enabled = enabled_from_env()
+        self.stats_window = None
+        
+        # Attach to a running tracker daemon (see daemon.py) if there is
+        # one; otherwise track in this process
+        self.tracker = connect_tracker()
+        if self.tracker is None:
+            self.tracker = Tracker()
         
         self.root = tk.Tk()
         self.root.title("MacBook Helper")
@@ -77,51 +57,38 @@ class MacBookHelper:
         self.style.configure('Treeview.Row', padding=1)
         self.style.map('Treeview', background=[('selected', '#0078d7')])
         
-        # Load or create tasks file
-        self.tasks_file = "tasks.json"
-        self.archive_file = "archive.json"
-        self.tasks = self.load_tasks()
-        self.archived_tasks = self.load_archive()
-        
-        # Track active applications and their details
-        self.active_apps = {}
-        self.last_active_app = None
-        self.last_active_window = None
-        self.app_start_time = {}
-        self.window_start_time = {}
-        self.MIN_ACTIVE_TIME = 20  # Minimum time in seconds before adding a task
-        self.stored_app = None
-        self.stored_window = None
+        self.rendered_org_method = None
+        self.shown_tracking_state = None
         
         # Create GUI elements
         self.create_widgets()
         
-        # Start monitoring thread
-        self.monitor_thread = Thread(target=self.monitor_applications, daemon=True)
-        self.monitor_thread.start()
+        # Start monitoring (a no-op when attached to a daemon)
+        self.tracker.start()
         
         # Update tasks every second
         self.update_tasks()
         
-    def load_tasks(self):
-        if os.path.exists(self.tasks_file):
-            with open(self.tasks_file, 'r') as f:
-                return json.load(f)
-        return []
-    
-    def load_archive(self):
-        if os.path.exists(self.archive_file):
-            with open(self.archive_file, 'r') as f:
-                return json.load(f)
-        return []
-    
-    def save_tasks(self):
-        with open(self.tasks_file, 'w') as f:
-            json.dump(self.tasks, f)
-    
-    def save_archive(self):
-        with open(self.archive_file, 'w') as f:
-            json.dump(self.archived_tasks, f)
+        # Flush pending journal writes before the window goes away
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        self.startup_timing['init'] = time.perf_counter() - init_started
+        self.root.after_idle(self.on_first_paint, init_started)
+        
+    def on_first_paint(self, init_started):
+        # Runs once Tk has drawn the window and gone idle
+        self.startup_timing['first_paint'] = time.perf_counter() - init_started
+        self.tracker.preload_archive()
+        
+        for phase, seconds in self.startup_timing.items():
+            METRICS.gauge("helper_startup_seconds", lambda seconds=seconds: seconds, phase=phase)
+        if os.environ.get("HELPER_STARTUP_TIMING"):
+            timings = ", ".join(f"{phase} {seconds * 1000:.0f}ms"
+                                for phase, seconds in self.startup_timing.items())
+            print(f"Startup: {timings}", file=sys.stderr)
+        
+    # Tracking, storage and titles live in self.tracker (tracker.py); this
+    # class only draws the tasks and forwards what the user does.
     
     def create_widgets(self):
         # Main container with padding
@@ -164,6 +131,10 @@ class MacBookHelper:
                                   command=self.archive_all)
         archive_button.pack(side='left')
         
+        stats_button = ttk.Button(control_frame, text="Stats", 
+                                command=self.toggle_stats)
+        stats_button.pack(side='right')
+        
         # Organization dropdown with better styling
         org_frame = ttk.Frame(main_frame)
         org_frame.pack(fill='x', pady=(0, 5))
@@ -187,16 +158,24 @@ class MacBookHelper:
         self.tree.column('status', width=50, anchor='center')
         
         # Add scrollbar with better styling
-        scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self.on_tree_scroll)
+        self.scroll_check_pending = False
         
         # Pack tree and scrollbar
         self.tree.pack(side='left', fill='both', expand=True)
-        scrollbar.pack(side='right', fill='y')
+        self.scrollbar.pack(side='right', fill='y')
+        
+        # Renders the task list into the tree incrementally; groups fill in
+        # their rows a page at a time as they are opened and scrolled
+        self.renderer = TaskTreeRenderer(self.tree)
+        self.tree.tag_configure('more', foreground='#0078d7')
         
         # Bind events to the tree
         self.tree.bind('<ButtonRelease-1>', self.on_tree_click)
         self.tree.bind('<Motion>', self.on_tree_motion)
+        self.tree.bind('<<TreeviewOpen>>', self.on_tree_open)
+        self.tree.bind('<<TreeviewClose>>', self.on_tree_close)
         
         # Stats frame with better styling
         stats_frame = ttk.Frame(main_frame)
@@ -217,203 +196,27 @@ class MacBookHelper:
                               font=('Helvetica', 12, 'overstrike'))
     
     def update_stats(self):
-        total = len(self.tasks)
-        completed = sum(1 for task in self.tasks if task['completed'])
-        active = total - completed
+        # Counts are maintained by the task store as tasks change
+        tasks = self.tracker.tasks
+        total = len(tasks)
+        completed = tasks.completed
+        active = tasks.active
         self.stats_label.config(text=f"Total tasks: {total} | Active: {active} | Completed: {completed}")
     
     def clear_completed(self):
         # Move completed tasks to archive
-        completed_tasks = [task for task in self.tasks if task['completed']]
-        self.archived_tasks.extend(completed_tasks)
-        self.save_archive()
-        
-        # Remove completed tasks from active list
-        self.tasks = [task for task in self.tasks if not task['completed']]
-        self.save_tasks()
+        self.tracker.clear_completed()
         self.refresh_tasks()
     
     def archive_all(self):
         # Move all tasks to archive
-        self.archived_tasks.extend(self.tasks)
-        self.save_archive()
-        
-        # Clear all tasks
-        self.tasks = []
-        self.save_tasks()
+        self.tracker.archive_all()
         self.refresh_tasks()
     
-    def monitor_applications(self):
-        while True:
-            current_app, current_window = self.get_active_application()
-            
-            if current_app and current_app != self.last_active_app:
-                self.last_active_app = current_app
-                self.last_active_window = current_window
-                # Store the application if it's not our helper app
-                if current_app != "Python" and current_app != "Terminal":
-                    self.stored_app = current_app
-                    self.stored_window = current_window
-            
-            elif current_app and current_window != self.last_active_window:
-                self.last_active_window = current_window
-                # Update stored window if it's not our helper app
-                if current_app != "Python" and current_app != "Terminal":
-                    self.stored_window = current_window
-            
-            time.sleep(1)
-    
-    def is_browser(self, app_name):
-        return app_name in ["Google Chrome", "Safari", "Firefox", "Microsoft Edge"]
-    
-    def get_active_application(self):
-        try:
-            app_script = 'tell application "System Events" to get name of first process whose frontmost is true'
-            app_result = subprocess.run(['osascript', '-e', app_script], capture_output=True, text=True)
-            
-            if app_result.returncode == 0:
-                app_name = app_result.stdout.strip()
-                
-                window_script = f'''
-                tell application "{app_name}"
-                    if it is running then
-                        try
-                            return name of front window
-                        on error
-                            return "Unknown Window"
-                        end try
-                    end if
-                end tell
-                '''
-                window_result = subprocess.run(['osascript', '-e', window_script], capture_output=True, text=True)
-                window_name = window_result.stdout.strip() if window_result.returncode == 0 else "Unknown Window"
-                
-                return app_name, window_name
-        except Exception as e:
-            print(f"Error getting active application: {e}")
-        return None, None
-    
-    def save_app_time(self, app_name):
-        if app_name in self.app_start_time:
-            start_time = self.app_start_time[app_name]
-            duration = datetime.now() - start_time
-            minutes = int(duration.total_seconds() / 60)
-            
-            for task in self.tasks:
-                if task['app_name'] == app_name and not task['completed']:
-                    task['text'] = f"Using {app_name} ({minutes} minutes)"
-                    self.save_tasks()
-                    break
-    
-    def task_exists(self, app_name, window_name):
-        # Check if we already have a task for this exact app and window
-        for task in self.tasks:
-            if (task['app_name'] == app_name and 
-                task['window_name'] == window_name and 
-                not task['completed']):
-                return True
-        
-        # For non-browser apps, only allow one active task per app
-        if not self.is_browser(app_name):
-            for task in self.tasks:
-                if task['app_name'] == app_name and not task['completed']:
-                    # Update the existing task with the new window name
-                    task['window_name'] = window_name
-                    if app_name == "Microsoft Word":
-                        task['text'] = f"Editing: {window_name}"
-                    elif app_name == "Microsoft Excel":
-                        task['text'] = f"Working on: {window_name}"
-                    elif app_name == "Preview":
-                        task['text'] = f"Viewing: {window_name}"
-                    else:
-                        task['text'] = f"Using {app_name}: {window_name}"
-                    self.save_tasks()
-                    return True
-        
-        return False
-    
-    def generate_task_description(self, app_name, window_name):
-        try:
-            # Check cache first
-            cache_key = f"{app_name}:{window_name}"
-            if cache_key in self.description_cache:
-                return self.description_cache[cache_key]
-            
-            # Check common patterns
-            for pattern, description in self.common_patterns.items():
-                if pattern.lower() in window_name.lower():
-                    self.description_cache[cache_key] = description
-                    return description
-            
-            # For messaging apps, use a simpler pattern
-            messaging_apps = ["Outlook", "Slack", "Microsoft Teams", "Messages", "WhatsApp"]
-            if app_name in messaging_apps:
-                description = f"💬 Responding to conversation"
-                self.description_cache[cache_key] = description
-                return description
-            
-            # Only call OpenAI for unique cases
-            prompt = f"""Given that I'm using {app_name} and the window/tab is '{window_name}', 
-            generate a concise, descriptive task title that explains what I'm likely doing. 
-            Include an appropriate emoji at the start. 
-            Do NOT include the application name in the description since it's already shown in the category.
-            
-            Special rules:
-            - If it's an email/messaging app and shows a specific conversation/email/chat,
-              use "Responding to" instead of "Working on" since the user is likely replying to that conversation.
-            - For other apps, describe the specific action being performed.
-            
-            The response should be just the task title, nothing else."""
-            
-            response = self.openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": """You are a helpful assistant that generates concise, descriptive task titles. 
-                    For messaging/email apps, use "Responding to" when a specific conversation is shown.
-                    For other apps, describe the specific action being performed.
-                    Never include the application name in the description."""},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=50,
-                temperature=0.7
-            )
-            
-            task_text = response.choices[0].message.content.strip()
-            self.description_cache[cache_key] = task_text
-            return task_text
-            
-        except Exception as e:
-            print(f"Error generating task description: {e}")
-            return f"Working on: {window_name}"
-    
     def add_task(self):
-        # Use the stored application and window instead of current
-        if self.stored_app and self.stored_window:
-            current_app = self.stored_app
-            current_window = self.stored_window
-            
-            # Generate task description using AI
-            task_text = self.generate_task_description(current_app, current_window)
-            
-            # Check if task already exists
-            task_exists = False
-            for task in self.tasks:
-                if task['app_name'] == current_app and task['window_name'] == current_window and not task['completed']:
-                    task_exists = True
-                    break
-            
-            if not task_exists:
-                task = {
-                    'text': task_text,
-                    'completed': False,
-                    'created_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    'auto_tracked': False,
-                    'app_name': current_app,
-                    'window_name': current_window
-                }
-                self.tasks.append(task)
-                self.save_tasks()
-                self.refresh_tasks()
+        # The tracker uses the last app and window seen outside the helper
+        if self.tracker.add_task():
+            self.refresh_tasks()
         
         # Clear the entry field
         self.task_entry.delete(0, tk.END)
@@ -426,89 +229,55 @@ class MacBookHelper:
         else:
             self.tree.configure(cursor='')
     
+    def on_tree_open(self, event):
+        self.renderer.expand(self.tree.focus())
+    
+    def on_tree_close(self, event):
+        self.renderer.collapse(self.tree.focus())
+    
+    def on_tree_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        # Load further pages once a group's "more" row scrolls into view
+        if not self.scroll_check_pending:
+            self.scroll_check_pending = True
+            self.tree.after_idle(self.check_tree_scroll)
+    
+    def check_tree_scroll(self):
+        self.scroll_check_pending = False
+        self.renderer.load_visible()
+    
     def on_tree_click(self, event):
         # Get the item that was clicked
         item = self.tree.identify_row(event.y)
-        if item and self.tree.parent(item):  # If a task was clicked (not a group)
-            # Get the task text and task object immediately
-            task_text = self.tree.item(item)['text']
-            task = next((t for t in self.tasks if t['text'] == task_text), None)
-            
-            if task:
-                # Toggle the task's completed status
-                task['completed'] = not task['completed']
-                if task['completed']:
-                    # Move to archive
-                    self.archived_tasks.append(task.copy())
-                    self.save_archive()
-                self.save_tasks()
+        if item and self.renderer.is_more(item):
+            self.renderer.load_more(item)
+        elif item and self.tree.parent(item):  # If a task was clicked (not a group)
+            # Look the task up by its ID, which stays correct for duplicate titles
+            task_id = self.renderer.task_id_for_item(item)
+            if task_id is not None:
+                # Toggle the task's completed status (completed tasks are archived)
+                self.tracker.toggle_task(task_id)
                 self.refresh_tasks()
     
     def on_org_change(self, *args):
         self.refresh_tasks()
     
+    def task_group_key(self, task):
+        # Shared with the daily summaries in export.py
+        return group_key(task, self.org_method.get())
+    
     def refresh_tasks(self):
-        # Clear existing items
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        if self.org_method.get() == "Type":
-            # Group tasks by type first
-            type_groups = {}
-            for task in self.tasks:
-                # Extract the type from the task text
-                task_type = task['text'].split(':')[0].strip()
-                if task_type not in type_groups:
-                    type_groups[task_type] = {}
-                
-                # Then group by application within each type
-                app_name = task['app_name']
-                if app_name not in type_groups[task_type]:
-                    type_groups[task_type][app_name] = []
-                type_groups[task_type][app_name].append(task)
-            
-            # Add type groups to tree
-            for task_type, app_groups in type_groups.items():
-                type_id = self.tree.insert('', 'end', text=task_type, open=True)
-                
-                # Add application groups within each type
-                for app_name, tasks in app_groups.items():
-                    app_id = self.tree.insert(type_id, 'end', text=app_name, open=True)
-                    
-                    # Sort tasks: completed tasks at the bottom
-                    tasks.sort(key=lambda x: x['completed'])
-                    
-                    for task in tasks:
-                        status = "✓" if task['completed'] else "○"
-                        item_id = self.tree.insert(app_id, 'end', text=task['text'], values=(status,))
-                        
-                        # Add visual styling for completed tasks
-                        if task['completed']:
-                            self.tree.item(item_id, tags=('completed',))
-        
-        else:  # Application organization
-            # Group tasks by application
-            app_groups = {}
-            for task in self.tasks:
-                app_name = task['app_name']
-                if app_name not in app_groups:
-                    app_groups[app_name] = []
-                app_groups[app_name].append(task)
-            
-            # Add application groups to tree
-            for app_name, tasks in app_groups.items():
-                app_id = self.tree.insert('', 'end', text=app_name, open=True)
-                
-                # Sort tasks: completed tasks at the bottom
-                tasks.sort(key=lambda x: x['completed'])
-                
-                for task in tasks:
-                    status = "✓" if task['completed'] else "○"
-                    item_id = self.tree.insert(app_id, 'end', text=task['text'], values=(status,))
-                    
-                    # Add visual styling for completed tasks
-                    if task['completed']:
-                        self.tree.item(item_id, tags=('completed',))
+        # Switching organization changes every group, so start from scratch
+        org_method = self.org_method.get()
+        if org_method != self.rendered_org_method:
+            self.renderer.reset()
+            self.rendered_org_method = org_method
+        
+        # Apply only what changed since the last render
+        tasks = self.tracker.tasks
+        with METRICS.timer("helper_refresh_seconds"):
+            if not self.renderer.render(tasks, self.task_group_key, tasks.version):
+                return
         
         # Configure tag for completed tasks
         self.tree.tag_configure('completed', foreground='gray', font=('Helvetica', 12, 'overstrike'))
@@ -516,18 +285,84 @@ class MacBookHelper:
         self.update_stats()
     
     def delete_task(self, item_id):
-        task_text = self.tree.item(item_id)['text']
-        self.tasks = [t for t in self.tasks if t['text'] != task_text]
-        self.save_tasks()
+        task_id = self.renderer.task_id_for_item(item_id)
+        if task_id is not None:
+            self.tracker.delete_task(task_id)
         self.refresh_tasks()
     
+    def update_status(self):
+        paused = self.tracker.paused
+        if paused == self.shown_tracking_state:
+            return
+        self.shown_tracking_state = paused
+        if paused:
+            self.status_label.config(text="⏸ Paused (idle)", foreground='#999999')
+        else:
+            self.status_label.config(text="✓ Auto-tracking active", foreground='#28a745')
+    
     def update_tasks(self):
+        self.tracker.tick()
+        self.update_status()
         self.refresh_tasks()
         self.root.after(1000, self.update_tasks)
     
+    def toggle_stats(self):
+        if self.stats_window is not None:
+            self.stats_window.destroy()
+            self.stats_window = None
+            return
+        
+        self.stats_window = tk.Toplevel(self.root)
+        self.stats_window.title("Helper Stats")
+        self.stats_window.attributes('-topmost', True)
+        self.stats_window.geometry("+360+0")
+        self.stats_window.protocol("WM_DELETE_WINDOW", self.toggle_stats)
+        self.stats_text = ttk.Label(self.stats_window, font=('Menlo', 11), justify='left',
+                                    padding=8)
+        self.stats_text.pack(fill='both', expand=True)
+        self.update_stats_panel()
+    
+    def update_stats_panel(self):
+        if self.stats_window is None:
+            return
+        # Asking the tracker for stats also turns recording on
+        stats = self.tracker.stats()
+        if stats is None:
+            self.stats_text.config(text="Tracker daemon unavailable")
+            self.stats_window.after(1000, self.update_stats_panel)
+            return
+        
+        lines = [f"{'latency':<34}{'n':>6}{'p50':>9}{'p95':>9}"]
+        for name, labels, count, p50, p95 in stats['latency']:
+            label = name.replace("helper_", "").replace("_seconds", "")
+            if labels:
+                label += "[" + ",".join(labels) + "]"
+            lines.append(f"{label:<34}{count:>6}{p50 * 1000:>7.1f}ms{p95 * 1000:>7.1f}ms")
+        
+        lines.append("")
+        for name, labels, value in stats['counters']:
+            label = name.replace("helper_", "")
+            if labels:
+                label += "[" + ",".join(labels) + "]"
+            lines.append(f"{label:<34}{value:>6}")
+        
+        lines.append(f"{'description cache hit rate':<34}{stats['cache_hit_rate']:>6.0%}")
+        classifier = stats['classifier']
+        lines.append(f"{'classifier hit rate':<34}{classifier['hit_rate']:>6.0%}")
+        lines.append(f"{'classifier avg':<34}{classifier['avg_us']:>6.1f}µs")
+        lines.append(f"{'probe (' + stats['probe_backend'] + ') avg':<34}{stats['probe_avg_ms']:>6.1f}ms")
+        lines.append(f"{'sampling interval':<34}{stats['sampling_interval']:>6.1f}s")
+        
+        self.stats_text.config(text="\n".join(lines))
+        self.stats_window.after(1000, self.update_stats_panel)
+    
+    def on_close(self):
+        self.tracker.close()
+        self.root.destroy()
+    
     def run(self):
         self.root.mainloop()
 
 if __name__ == "__main__":
     app = MacBookHelper()
-    app.run() 
\ No newline at end of file
+    app.run()
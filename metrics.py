@@ -0,0 +1,208 @@
+import bisect
+import os
+import time
+from threading import Lock, Thread
+
+# Latency buckets in seconds, from sub-millisecond lookups to slow API calls
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_TIMER = NullTimer()
+
+
+class Metrics:
+    # Registry of counters, latency histograms and gauges for the helper.
+    #
+    # When disabled, timer() hands back a shared no-op context manager and
+    # inc() returns straight away, so instrumented code pays one attribute
+    # check. Gauges are callables evaluated only when metrics are rendered.
+    # Metrics are identified by name plus a small set of labels and
+    # rendered in the Prometheus text format.
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = Lock()
+        self.counters = {}    # (name, labels) -> Counter
+        self.histograms = {}  # (name, labels) -> Histogram
+        self.gauges = {}      # (name, labels) -> callable
+        self.help = {}
+        self.server = None
+
+    def _key(self, name, labels):
+        return (name, tuple(sorted(labels.items())))
+
+    def timer(self, name, **labels):
+        if not self.enabled:
+            return NULL_TIMER
+        return Timer(self.histogram(name, **labels))
+
+    def inc(self, name, amount=1, **labels):
+        if self.enabled:
+            self.counter(name, **labels).inc(amount)
+
+    def counter(self, name, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            return self.counters.setdefault(key, Counter())
+
+    def histogram(self, name, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            return self.histograms.setdefault(key, Histogram())
+
+    def gauge(self, name, fn, **labels):
+        with self.lock:
+            self.gauges[self._key(name, labels)] = fn
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    # Output
+
+    def render(self):
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items())
+            gauges = sorted(self.gauges.items())
+
+        for kind, items in (('counter', counters), ('histogram', histograms), ('gauge', gauges)):
+            last_name = None
+            for (name, labels), metric in items:
+                if name != last_name:
+                    if name in self.help:
+                        lines.append(f"# HELP {name} {self.help[name]}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    last_name = name
+                if kind == 'counter':
+                    lines.append(f"{name}{format_labels(labels)} {metric.value}")
+                elif kind == 'gauge':
+                    try:
+                        value = metric()
+                    except Exception:
+                        continue
+                    if value is not None:
+                        lines.append(f"{name}{format_labels(labels)} {value}")
+                else:
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets + (float('inf'),), metric.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float('inf') else repr(bound)
+                        lines.append(f"{name}_bucket{format_labels(labels + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{format_labels(labels)} {metric.sum}")
+                    lines.append(f"{name}_count{format_labels(labels)} {metric.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        # Temp file plus rename so a scraper never reads a partial file
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def serve(self, port, host="127.0.0.1"):
+        # Local Prometheus endpoint at http://host:port/metrics
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                data = metrics.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{escape(value)}"' for key, value in labels)
+    return "{" + pairs + "}"
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def enabled_from_env():
+    return bool(os.environ.get("HELPER_METRICS") or
+                os.environ.get("HELPER_METRICS_PORT") or
+                os.environ.get("HELPER_METRICS_FILE"))
+
+
+# Shared registry. Off until configured, e.g. by HELPER_METRICS=1,
+# HELPER_METRICS_PORT or HELPER_METRICS_FILE (see MacBookHelper)
+METRICS = Metrics()
@@ -0,0 +1,137 @@
+import json
+import os
+
+# Common window patterns and their descriptions, in priority order
+DEFAULT_PATTERNS = {
+    # Email patterns
+    "Inbox": "📧 Checking new messages",
+    "Draft": "📧 Composing email",
+    "Sent": "📧 Reviewing sent items",
+    "Calendar": "📅 Managing calendar",
+
+    # Browser patterns
+    "mail.google.com": "📧 Using Gmail",
+    "calendar.google.com": "📅 Using Calendar",
+    "docs.google.com": "📝 Using Google Docs",
+    "sheets.google.com": "📊 Using Google Sheets",
+    "meet.google.com": "🎥 In Google Meet",
+
+    # Document patterns
+    ".doc": "📝 Editing document",
+    ".docx": "📝 Editing document",
+    ".xls": "📊 Working on spreadsheet",
+    ".xlsx": "📊 Working on spreadsheet",
+    ".ppt": "📊 Working on presentation",
+    ".pptx": "📊 Working on presentation",
+    ".pdf": "📄 Viewing document",
+
+    # Development patterns
+    ".py": "💻 Writing Python code",
+    ".js": "💻 Writing JavaScript code",
+    ".html": "💻 Writing HTML",
+    ".css": "💻 Writing CSS",
+    ".md": "📝 Writing documentation"
+}
+
+DEFAULT_MESSAGING_APPS = ["Outlook", "Slack", "Microsoft Teams", "Messages", "WhatsApp"]
+
+MESSAGING_DESCRIPTION = "💬 Responding to conversation"
+
+
+class PatternMatcher:
+    # Aho-Corasick automaton over all patterns. A title is classified in a
+    # single pass over its characters no matter how many rules there are;
+    # when several patterns occur, the one listed first wins, as it did
+    # when the rules were checked one by one.
+
+    def __init__(self, rules):
+        self.rules = []
+        self.goto = [{}]
+        self.fail = [0]
+        self.best = [None]  # lowest rule index matched on reaching a state
+
+        for pattern, description in rules:
+            if not pattern:
+                continue
+            index = len(self.rules)
+            self.rules.append((pattern, description))
+            state = 0
+            for ch in pattern.lower():
+                next_state = self.goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.best.append(None)
+                    self.goto[state][ch] = next_state
+                state = next_state
+            if self.best[state] is None:
+                self.best[state] = index
+
+        # Breadth-first pass to fill in failure links, folding each state's
+        # best match together with everything reachable through them
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for ch, child in self.goto[state].items():
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(ch, 0)
+                inherited = self.best[self.fail[child]]
+                if inherited is not None and (self.best[child] is None or inherited < self.best[child]):
+                    self.best[child] = inherited
+                queue.append(child)
+
+    def match(self, text):
+        goto = self.goto
+        fail = self.fail
+        best_states = self.best
+        best = None
+        state = 0
+        for ch in text.lower():
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            found = best_states[state]
+            if found is not None and (best is None or found < best):
+                best = found
+                if best == 0:
+                    break
+        return self.rules[best][1] if best is not None else None
+
+
+class PatternRules:
+    # Compiled classification rules. Rebuilt as a whole and swapped in with
+    # a single assignment, so readers never see a half-updated rule set.
+
+    def __init__(self, patterns, messaging_apps):
+        self.matcher = PatternMatcher(patterns.items())
+        self.messaging_apps = frozenset(messaging_apps)
+
+    def classify(self, app_name, window_name):
+        description = self.matcher.match(window_name)
+        if description is not None:
+            return description
+        # For messaging apps, use a simpler pattern
+        if app_name in self.messaging_apps:
+            return MESSAGING_DESCRIPTION
+        return None
+
+
+def load_pattern_rules(path=None):
+    # Merge user rules from a JSON file of the form
+    #   {"patterns": {"pattern": "description", ...}, "messaging_apps": [...]}
+    # with the defaults. User patterns come first so they take priority.
+    patterns = {}
+    messaging_apps = list(DEFAULT_MESSAGING_APPS)
+    if path and os.path.exists(path):
+        try:
+            with open(path, 'r') as f:
+                user_rules = json.load(f)
+            patterns.update(user_rules.get('patterns', {}))
+            messaging_apps.extend(user_rules.get('messaging_apps', []))
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"Error loading pattern rules from {path}: {e}")
+    for pattern, description in DEFAULT_PATTERNS.items():
+        patterns.setdefault(pattern, description)
+    return PatternRules(patterns, messaging_apps)
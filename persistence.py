@@ -0,0 +1,116 @@
+import atexit
+import time
+from threading import Condition, Thread
+
+# Write-behind for everything the helper keeps on disk. Stores change in
+# memory on the owner thread and only mark themselves dirty here; one
+# background thread does the actual writing once a store has been quiet
+# for `delay` seconds, so a burst of clicks costs one write (and one
+# fsync) instead of one per click, and the UI never waits for the disk.
+
+
+class WriteBehind:
+    # Pending writes are callables, usually a store's bound method that
+    # writes whatever it has collected since the last call. Marking a
+    # write that is already pending only pushes its deadline back, up to
+    # max_delay after it was first marked.
+    #
+    # flush() runs everything pending right away and waits for it. After
+    # close() (at exit at the latest) the thread is gone and mark() writes
+    # on the spot.
+
+    def __init__(self, delay=0.25, max_delay=2.0):
+        self.delay = delay
+        self.max_delay = max_delay
+        self.cond = Condition()
+        self.pending = {}  # write -> (first marked, last marked)
+        self.running = []  # writes taken by the thread and not finished yet
+        self.urgent = 0    # flush() calls waiting
+        self.stopped = False
+        self.thread = None
+        self.writes = 0
+        self.coalesced = 0
+
+    def mark(self, write):
+        now = time.monotonic()
+        with self.cond:
+            if not self.stopped:
+                marked = self.pending.get(write)
+                if marked is None:
+                    self.pending[write] = (now, now)
+                else:
+                    self.pending[write] = (marked[0], now)
+                    self.coalesced += 1
+                if self.thread is None:
+                    self.thread = Thread(target=self._run, name="write-behind", daemon=True)
+                    self.thread.start()
+                self.cond.notify_all()
+                return
+        self._write(write)
+
+    def flush(self):
+        with self.cond:
+            self.urgent += 1
+            self.cond.notify_all()
+            try:
+                while self.pending or self.running:
+                    self.cond.wait()
+            finally:
+                self.urgent -= 1
+
+    def close(self):
+        with self.cond:
+            self.stopped = True
+            thread = self.thread
+            self.cond.notify_all()
+        if thread is not None:
+            thread.join()
+
+    def _deadline(self, marked):
+        first, last = marked
+        return min(last + self.delay, first + self.max_delay)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while True:
+                    now = time.monotonic()
+                    due = [write for write, marked in self.pending.items()
+                           if self.urgent or self.stopped or self._deadline(marked) <= now]
+                    if due:
+                        break
+                    if self.stopped:
+                        self.thread = None
+                        return
+                    timeout = None
+                    if self.pending:
+                        timeout = min(map(self._deadline, self.pending.values())) - now
+                    self.cond.wait(timeout)
+                for write in due:
+                    del self.pending[write]
+                self.running = due
+
+            for write in due:
+                self._write(write)
+
+            with self.cond:
+                self.writes += len(due)
+                self.running = []
+                self.cond.notify_all()
+
+    def _write(self, write):
+        try:
+            write()
+        except Exception as e:
+            print(f"Error in background write: {e}")
+
+    def stats(self):
+        with self.cond:
+            return {'pending': len(self.pending) + len(self.running), 'writes': self.writes,
+                    'coalesced': self.coalesced}
+
+
+# Shared by every store in the process; whatever is still pending at
+# exit is written then
+WRITER = WriteBehind()
+atexit.register(WRITER.close)
@@ -0,0 +1,317 @@
+import json
+import os
+import select
+import subprocess
+import sys
+import time
+
+# Long-lived JXA helper: answers each input line with the frontmost app, its
+# front window and the seconds since the last keyboard/mouse event as one
+# JSON line, so a sample costs one pipe round trip instead of two osascript
+# process spawns
+HELPER_SCRIPT = r"""
+ObjC.import('Foundation');
+ObjC.import('CoreGraphics');
+function run() {
+    const events = Application('System Events');
+    const input = $.NSFileHandle.fileHandleWithStandardInput;
+    const output = $.NSFileHandle.fileHandleWithStandardOutput;
+    while (true) {
+        const request = input.availableData;
+        if (request.length == 0) {
+            return;
+        }
+        let app = null;
+        let win = 'Unknown Window';
+        try {
+            const proc = events.processes.whose({frontmost: true})[0];
+            app = proc.name();
+            try {
+                win = proc.windows[0].name();
+            } catch (e) {}
+        } catch (e) {}
+        let idle = null;
+        try {
+            idle = $.CGEventSourceSecondsSinceLastEventType(1, 4294967295);
+        } catch (e) {}
+        const line = JSON.stringify([app, win, idle]) + '\n';
+        output.writeData($(line).dataUsingEncoding($.NSUTF8StringEncoding));
+    }
+}
+"""
+
+WINDOW_SCRIPT = """
+on run argv
+    set appName to item 1 of argv
+    tell application appName
+        if it is running then
+            try
+                return name of front window
+            on error
+                return "Unknown Window"
+            end try
+        end if
+    end tell
+end run
+"""
+
+
+class WindowProbe:
+    # Base class for active-window backends. probe() returns
+    # (app_name, window_name), or (None, None) when nothing can be read,
+    # and keeps track of how long each probe takes.
+    name = "base"
+
+    def __init__(self):
+        self.probes = 0
+        self.total_time = 0.0
+        self.last_time = 0.0
+        self.max_time = 0.0
+
+    def probe(self):
+        start = time.perf_counter()
+        try:
+            return self._probe()
+        except Exception as e:
+            print(f"Error getting active application: {e}")
+            return None, None
+        finally:
+            elapsed = time.perf_counter() - start
+            self.probes += 1
+            self.total_time += elapsed
+            self.last_time = elapsed
+            self.max_time = max(self.max_time, elapsed)
+
+    def _probe(self):
+        raise NotImplementedError
+
+    def idle_seconds(self):
+        # Seconds since the last user input, or None if the backend can't tell
+        return None
+
+    def timing(self):
+        return {
+            'backend': self.name,
+            'probes': self.probes,
+            'last_ms': self.last_time * 1000,
+            'avg_ms': self.total_time / self.probes * 1000 if self.probes else 0.0,
+            'max_ms': self.max_time * 1000
+        }
+
+    def close(self):
+        pass
+
+
+class OsascriptProbe(WindowProbe):
+    # Original approach: two osascript runs per sample. Slow, but needs
+    # nothing beyond macOS itself, so it serves as the fallback.
+    name = "osascript-oneshot"
+
+    def _probe(self):
+        app_script = 'tell application "System Events" to get name of first process whose frontmost is true'
+        app_result = subprocess.run(['osascript', '-e', app_script], capture_output=True, text=True)
+        if app_result.returncode != 0:
+            return None, None
+
+        app_name = app_result.stdout.strip()
+        # Pass the app name as an argument rather than splicing it into the script
+        window_result = subprocess.run(['osascript', '-e', WINDOW_SCRIPT, app_name],
+                                       capture_output=True, text=True)
+        window_name = window_result.stdout.strip() if window_result.returncode == 0 else "Unknown Window"
+        return app_name, window_name
+
+    def idle_seconds(self):
+        try:
+            result = subprocess.run(['ioreg', '-c', 'IOHIDSystem', '-d', '4'],
+                                    capture_output=True, text=True)
+        except OSError:
+            return None
+        for line in result.stdout.splitlines():
+            if '"HIDIdleTime"' in line:
+                return int(line.rsplit('=', 1)[1]) / 1e9
+        return None
+
+
+class PersistentOsascriptProbe(WindowProbe):
+    # Keeps one osascript process running and asks it for app and window
+    # in a single round trip. The helper is restarted if it dies or hangs.
+    name = "osascript"
+
+    def __init__(self, timeout=2.0):
+        super().__init__()
+        self.timeout = timeout
+        self.process = None
+        self.idle = None
+        self.idle_at = 0.0
+
+    def _start(self):
+        self.process = subprocess.Popen(
+            ['osascript', '-l', 'JavaScript', '-e', HELPER_SCRIPT],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, bufsize=1)
+
+    def _probe(self):
+        if self.process is None or self.process.poll() is not None:
+            self._start()
+
+        self.process.stdin.write("?\n")
+        self.process.stdin.flush()
+        ready, _, _ = select.select([self.process.stdout], [], [], self.timeout)
+        line = self.process.stdout.readline() if ready else ""
+        if not line:
+            # Hung or exited: start a fresh helper next time
+            self.close()
+            return None, None
+
+        app_name, window_name, self.idle = json.loads(line)
+        self.idle_at = time.monotonic()
+        return app_name, window_name
+
+    def idle_seconds(self):
+        # Idle time arrives with every sample; only ask again if it is stale
+        if time.monotonic() - self.idle_at > 1.0:
+            self.probe()
+        return self.idle
+
+    def close(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+
+
+class X11Probe(WindowProbe):
+    # Reads _NET_ACTIVE_WINDOW from the root window over a persistent X
+    # connection (python-xlib). The app name comes from WM_CLASS and the
+    # title from _NET_WM_NAME, falling back to WM_NAME.
+    name = "x11"
+
+    def __init__(self):
+        super().__init__()
+        try:
+            from Xlib import X, display
+        except ImportError:
+            raise RuntimeError("python-xlib is required for the X11 probe")
+        self.any_property = X.AnyPropertyType
+        self.display = display.Display()
+        self.root = self.display.screen().root
+        self.active_atom = self.display.intern_atom('_NET_ACTIVE_WINDOW')
+        self.name_atom = self.display.intern_atom('_NET_WM_NAME')
+        self.utf8_atom = self.display.intern_atom('UTF8_STRING')
+        self.has_screensaver = self.display.has_extension('MIT-SCREEN-SAVER')
+
+    def _probe(self):
+        active = self.root.get_full_property(self.active_atom, self.any_property)
+        if not active or not active.value or not active.value[0]:
+            return None, None
+
+        window = self.display.create_resource_object('window', active.value[0])
+        wm_class = window.get_wm_class()
+        app_name = wm_class[1] if wm_class else "Unknown"
+
+        title = window.get_full_property(self.name_atom, self.utf8_atom)
+        if title and title.value:
+            value = title.value
+            window_name = value.decode('utf-8', 'replace') if isinstance(value, bytes) else str(value)
+        else:
+            window_name = window.get_wm_name() or "Unknown Window"
+        return app_name, window_name
+
+    def idle_seconds(self):
+        if not self.has_screensaver:
+            return None
+        return self.root.screensaver_query_info().idle / 1000
+
+    def close(self):
+        self.display.close()
+
+
+class ScriptedProbe(WindowProbe):
+    # Plays back a fixed sequence of (app_name, window_name) samples, for
+    # tests, benchmarks and replaying recorded sessions. A sample may carry
+    # a third value, the idle seconds reported alongside it: the next
+    # idle_seconds() call returns it once, later calls None until another
+    # sample brings one. Idle checks never advance the script. After the
+    # script runs out it either starts over (loop) or keeps returning the
+    # last one.
+    name = "scripted"
+
+    def __init__(self, samples, loop=False):
+        super().__init__()
+        self.samples = [tuple(sample) if sample else (None, None) for sample in samples]
+        self.loop = loop
+        self.position = 0
+        self.idle = None
+
+    @classmethod
+    def from_file(cls, path, loop=False):
+        # One JSON [app_name, window_name] pair per line, as written by RecordingProbe
+        with open(path, 'r') as f:
+            return cls([json.loads(line) for line in f if line.strip()], loop=loop)
+
+    def _probe(self):
+        if not self.samples:
+            return None, None
+        if self.position >= len(self.samples):
+            if not self.loop:
+                return self.samples[-1][:2]
+            self.position = 0
+        sample = self.samples[self.position]
+        self.position += 1
+        self.idle = sample[2] if len(sample) > 2 else None
+        return sample[:2]
+
+    def idle_seconds(self):
+        idle, self.idle = self.idle, None
+        return idle
+
+
+class RecordingProbe(WindowProbe):
+    # Wraps another probe and appends every sample to a file that
+    # ScriptedProbe.from_file can replay
+    def __init__(self, inner, path):
+        super().__init__()
+        self.inner = inner
+        self.name = inner.name
+        self.file = open(path, 'a')
+
+    def _probe(self):
+        sample = self.inner.probe()
+        self.file.write(json.dumps(list(sample)) + "\n")
+        self.file.flush()
+        return sample
+
+    def idle_seconds(self):
+        return self.inner.idle_seconds()
+
+    def close(self):
+        self.inner.close()
+        self.file.close()
+
+
+def create_probe(backend=None):
+    # HELPER_PROBE picks the backend: "osascript", "osascript-oneshot",
+    # "x11" or "replay:<file>". HELPER_PROBE_RECORD=<file> records samples.
+    backend = backend or os.environ.get("HELPER_PROBE")
+    if not backend:
+        backend = "osascript" if sys.platform == "darwin" else "x11"
+
+    if backend.startswith("replay:"):
+        probe = ScriptedProbe.from_file(backend[len("replay:"):])
+    elif backend == "osascript":
+        probe = PersistentOsascriptProbe()
+    elif backend == "osascript-oneshot":
+        probe = OsascriptProbe()
+    elif backend == "x11":
+        try:
+            probe = X11Probe()
+        except Exception as e:
+            print(f"X11 probe unavailable, window tracking disabled: {e}")
+            probe = ScriptedProbe([])
+    else:
+        raise ValueError(f"Unknown probe backend: {backend}")
+
+    record_path = os.environ.get("HELPER_PROBE_RECORD")
+    if record_path:
+        probe = RecordingProbe(probe, record_path)
+    return probe
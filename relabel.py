@@ -0,0 +1,285 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from threading import Lock
+
+from archive_db import ArchiveDB
+from description_cache import DescriptionCache
+from export import iter_archive
+from journal import JournalStore
+from patterns import load_pattern_rules
+from titles import description_key, is_fallback_title
+
+# Gives archived tasks that only have a made-up title ("Working on: …",
+# "Using Slack (12 minutes)") a real one after the fact. The archive is
+# streamed once and its fallback titles deduped by normalized app:window;
+# windows that a pattern or the description cache already covers cost
+# nothing, and the rest are sent many at a time in JSON-mode chat
+# completions, on a few threads under a request rate limit. Finished
+# titles go to a checkpoint file as they arrive, so an interrupted run
+# picks up where it stopped, and into the description cache for the
+# helper to reuse.
+#
+#   python relabel.py --dry-run          # count what would be relabeled
+#   python relabel.py --batch-size 25 --workers 4 --rpm 60
+#
+# Run it while the helper (and daemon.py) is stopped: the archive is
+# rewritten at the end. OPENAI_BASE_URL can point it at fake_openai.py.
+
+SYSTEM_PROMPT = """You are a helpful assistant that generates concise, descriptive task titles.
+For messaging/email apps, use "Responding to" when a specific conversation is shown.
+For other apps, describe the specific action being performed.
+Never include the application name in the description."""
+
+BATCH_PROMPT = """Each entry below is an application and the title of its window/tab. For every entry,
+generate a concise, descriptive task title that explains what I'm likely doing, with an
+appropriate emoji at the start. Do NOT include the application name in the title.
+
+Reply with a JSON object of the form {"titles": {"<id>": "<task title>", ...}} with one
+entry per id.
+
+"""
+
+
+class RateLimiter:
+    # Token bucket shared by the worker threads: at most `rate` requests
+    # per minute on average, with bursts of up to `burst`
+
+    def __init__(self, rate, burst=1):
+        self.interval = 60.0 / rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) / self.interval)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) * self.interval
+            time.sleep(wait)
+
+
+class Checkpoint:
+    # Titles found so far, one JSON line per window: {"key": ..., "title": ...}
+
+    def __init__(self, path):
+        self.path = path
+        self.titles = {}
+        # Byte offset just past the last complete record
+        good = 0
+        newline = True
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Truncated last line from an interrupted run
+                        break
+                    self.titles[record['key']] = record['title']
+                    good += len(line)
+                    newline = line.endswith(b"\n")
+            # Drop the partial line, so new records don't get glued to it
+            os.truncate(path, good)
+        self.file = open(path, 'a')
+        if not newline:
+            self.file.write("\n")
+
+    def add(self, titles):
+        for key, title in titles.items():
+            self.titles[key] = title
+            self.file.write(json.dumps({'key': key, 'title': title}, ensure_ascii=False) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+
+def fallback_windows(tasks):
+    # normalized app:window key -> (app, window) of its first fallback task
+    windows = {}
+    count = 0
+    for task in tasks:
+        if is_fallback_title(task):
+            count += 1
+            windows.setdefault(description_key(task['app_name'], task['window_name']),
+                               (task['app_name'], task['window_name']))
+    return windows, count
+
+
+def describe_locally(windows, pattern_rules, cache):
+    # Titles available without the network, as in Tracker.describe_locally
+    titles = {}
+    for key, (app_name, window_name) in windows.items():
+        title = pattern_rules.classify(app_name, window_name) or cache.get(key)
+        if title is not None:
+            titles[key] = title
+    return titles
+
+
+def request_titles(client, model, batch, limiter, timeout):
+    # One chat completion for a batch of (key, app, window); returns the
+    # titles the reply contained, by key
+    entries = [{'id': str(n), 'app': app_name, 'window': window_name}
+               for n, (_, app_name, window_name) in enumerate(batch)]
+    limiter.acquire()
+    response = client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": BATCH_PROMPT + json.dumps(entries, ensure_ascii=False)}
+        ],
+        response_format={"type": "json_object"},
+        max_tokens=40 * len(batch),
+        temperature=0.7,
+        timeout=timeout
+    )
+    reply = json.loads(response.choices[0].message.content)
+    by_id = reply.get('titles') if isinstance(reply, dict) else None
+    if not isinstance(by_id, dict):
+        raise ValueError("reply has no 'titles' object")
+
+    titles = {}
+    for n, (key, _, _) in enumerate(batch):
+        title = by_id.get(str(n))
+        if isinstance(title, str) and title.strip():
+            titles[key] = title.strip()
+    return titles
+
+
+def relabel_remote(windows, checkpoint, cache, batch_size=25, workers=4, rpm=60,
+                   model="gpt-3.5-turbo", timeout=60, retries=3):
+    # Ask OpenAI for every window in batches; returns (requests, failed windows)
+    import openai
+    client = openai.OpenAI(max_retries=retries)
+    limiter = RateLimiter(rpm, burst=workers)
+    pending = [(key, app_name, window_name) for key, (app_name, window_name) in windows.items()]
+    batches = [pending[n:n + batch_size] for n in range(0, len(pending), batch_size)]
+
+    failed = 0
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="relabel")
+    futures = {executor.submit(request_titles, client, model, batch, limiter, timeout): batch
+               for batch in batches}
+    try:
+        # Results are recorded here, on the main thread only
+        for done, future in enumerate(as_completed(futures), 1):
+            batch = futures[future]
+            try:
+                titles = future.result()
+            except Exception as e:
+                print(f"Error relabeling a batch of {len(batch)} windows: {e}")
+                failed += len(batch)
+                continue
+            checkpoint.add(titles)
+            for key, title in titles.items():
+                cache.put(key, title)
+            failed += len(batch) - len(titles)
+            print(f"{done}/{len(batches)} batches", file=sys.stderr)
+    finally:
+        # On Ctrl-C, drop the batches not started yet; the checkpoint keeps the rest
+        executor.shutdown(cancel_futures=True)
+    return len(batches), failed
+
+
+def apply_titles(archive_file, backend, titles):
+    # Rewrite fallback titles in the archive; returns the number of tasks changed
+    def relabel(task):
+        if is_fallback_title(task):
+            return titles.get(description_key(task['app_name'], task['window_name']))
+        return None
+
+    if backend == "sqlite":
+        db = ArchiveDB(os.path.splitext(archive_file)[0] + ".db")
+        try:
+            return db.update_texts(relabel)
+        finally:
+            db.close()
+
+    store = JournalStore(archive_file)
+    try:
+        changed = 0
+        for task in store.load():
+            text = relabel(task)
+            if text is not None and text != task['text']:
+                task['text'] = text
+                changed += 1
+        if changed:
+            store.compact()
+        return changed
+    finally:
+        store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Give archived tasks with fallback titles an AI title")
+    parser.add_argument("--archive-file", default="archive.json")
+    parser.add_argument("--checkpoint", default="relabel_checkpoint.jsonl",
+                        help="progress file; a rerun resumes from it")
+    parser.add_argument("--batch-size", type=int, default=25, help="windows per request")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent requests")
+    parser.add_argument("--rpm", type=float, default=60, help="requests per minute")
+    parser.add_argument("--model", default="gpt-3.5-turbo")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="only count fallback titles and the requests needed")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    from daemon import connect_tracker
+    if not args.dry_run and connect_tracker() is not None:
+        print("A tracker daemon is running; stop it first (python daemon.py stop)")
+        return 1
+
+    backend = os.environ.get("ARCHIVE_BACKEND", "json")
+    windows, count = fallback_windows(iter_archive(args.archive_file, None, None, backend))
+
+    checkpoint = Checkpoint(args.checkpoint)
+    cache = DescriptionCache(
+        "description_cache.db",
+        max_entries=int(os.environ.get("DESCRIPTION_CACHE_SIZE", 5000)),
+        ttl=float(os.environ.get("DESCRIPTION_CACHE_TTL_DAYS", 30)) * 24 * 3600
+    )
+    try:
+        titles = dict(checkpoint.titles)
+        remaining = {key: window for key, window in windows.items() if key not in titles}
+        pattern_rules = load_pattern_rules(os.environ.get("PATTERNS_FILE", "patterns.json"))
+        local = describe_locally(remaining, pattern_rules, cache)
+        titles.update(local)
+        remaining = {key: window for key, window in remaining.items() if key not in local}
+
+        print(f"{count} fallback titles over {len(windows)} distinct windows: "
+              f"{len(windows) - len(local) - len(remaining)} from the checkpoint, {len(local)} from "
+              f"patterns or cache, {len(remaining)} to request", file=sys.stderr)
+        if args.dry_run:
+            requests = -(-len(remaining) // args.batch_size)
+            print(f"{requests} requests of up to {args.batch_size} windows", file=sys.stderr)
+            return 0
+
+        failed = 0
+        if remaining:
+            requests, failed = relabel_remote(remaining, checkpoint, cache, args.batch_size,
+                                              args.workers, args.rpm, args.model)
+            titles.update(checkpoint.titles)
+            print(f"{requests} requests, {failed} windows without a title", file=sys.stderr)
+
+        changed = apply_titles(args.archive_file, backend, titles)
+        print(f"Relabeled {changed} archived tasks", file=sys.stderr)
+        return 1 if failed else 0
+    finally:
+        checkpoint.close()
+        cache.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
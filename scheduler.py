@@ -0,0 +1,87 @@
+import time
+
+# Frontmost "apps" that mean the screen is locked or the screensaver is up
+LOCKED_APPS = frozenset(["loginwindow", "ScreenSaverEngine"])
+
+
+class SamplingScheduler:
+    # Decides how long monitor_applications sleeps between probes.
+    #
+    # Right after a switch we sample every min_interval so short visits
+    # aren't missed. While app and window stay the same the interval grows
+    # by backoff up to max_interval. Once the user has been idle for
+    # idle_after seconds, or the screen is locked, window probing pauses
+    # and only the idle time is checked every paused_interval seconds.
+
+    def __init__(self, min_interval=0.5, max_interval=4.0, backoff=1.5,
+                 idle_after=300, paused_interval=10.0, idle_check_every=10.0):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.idle_after = idle_after
+        self.paused_interval = paused_interval
+        self.idle_check_every = idle_check_every
+        self.interval = min_interval
+        self.paused = False
+        self.last_sample = None
+        self.last_idle_check = None
+        self.wakeups = 0
+
+    @property
+    def rate(self):
+        # Current samples per second
+        return 1.0 / self.interval
+
+    @property
+    def state(self):
+        if self.paused:
+            return "paused"
+        return "active" if self.interval == self.min_interval else "backing off"
+
+    def check_idle(self, probe):
+        # Idle checks can be costly on some backends, so while active they
+        # only run every idle_check_every seconds; while paused, every wakeup
+        now = time.monotonic()
+        if (not self.paused and self.last_idle_check is not None and
+                now - self.last_idle_check < self.idle_check_every):
+            return False
+        self.last_idle_check = now
+
+        idle = probe.idle_seconds()
+        if idle is not None and idle >= self.idle_after:
+            self.pause()
+            return True
+        if self.paused:
+            self.resume()
+        return False
+
+    def observe(self, sample):
+        # Called after each probe with (app_name, window_name)
+        if sample[0] in LOCKED_APPS:
+            self.pause()
+        elif self.paused or sample != self.last_sample:
+            self.resume()
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+        self.last_sample = sample
+        return self.interval
+
+    def pause(self):
+        self.paused = True
+        self.interval = self.paused_interval
+        return self.interval
+
+    def resume(self):
+        self.paused = False
+        self.interval = self.min_interval
+        self.last_sample = None
+
+    def sleep(self):
+        self.wakeups += 1
+        start = time.time()
+        time.sleep(self.interval)
+        # Wall clock jumping well past the interval means the machine was
+        # asleep: sample quickly again and re-check idle straight away
+        if time.time() - start > self.interval + 30:
+            self.resume()
+            self.last_idle_check = None
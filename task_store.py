@@ -0,0 +1,317 @@
+import sys
+from collections.abc import MutableMapping
+from datetime import datetime, timedelta
+
+from titles import normalize_title
+
+EPOCH = datetime(1970, 1, 1)
+DAY = timedelta(days=1)
+
+
+class TaskRecord(MutableMapping):
+    # A task in a fraction of the memory of a dict. The usual fields live in
+    # slots; app, window and text strings are interned, so the thousands of
+    # tasks for one app or window share a single copy; created_at is kept
+    # as whole seconds since the epoch (in the same naive local time as
+    # the string). Any other keys go to a small `extra` dict.
+    #
+    # It reads and writes like the dict it replaces (task['text'],
+    # task.get('id'), dict(task)), and to_dict() gives back the same JSON
+    # object it was built from.
+
+    __slots__ = ('id', 'text', 'completed', 'created', 'auto_tracked', 'app_name',
+                 'window_name', 'extra')
+
+    def __init__(self, text, completed, created_at, app_name, window_name,
+                 auto_tracked=None, id=None, extra=None):
+        self.text = sys.intern(text)
+        self.completed = completed
+        self.created = encode_time(created_at)
+        self.app_name = sys.intern(app_name)
+        self.window_name = sys.intern(window_name)
+        self.auto_tracked = auto_tracked  # None: not set
+        self.id = id                      # None: not assigned yet
+        self.extra = extra or None
+
+    @classmethod
+    def from_dict(cls, task):
+        extra = None
+        if not task.keys() <= FIELDS:
+            extra = {key: value for key, value in task.items() if key not in FIELDS}
+        return cls(task['text'], task['completed'], task['created_at'], task['app_name'],
+                   task['window_name'], task.get('auto_tracked'), task.get('id'), extra)
+
+    def to_dict(self):
+        # Keys in the order the tracker has always written them
+        task = {'text': self.text, 'completed': self.completed, 'created_at': self.created_at}
+        if self.auto_tracked is not None:
+            task['auto_tracked'] = self.auto_tracked
+        task['app_name'] = self.app_name
+        task['window_name'] = self.window_name
+        if self.id is not None:
+            task['id'] = self.id
+        if self.extra:
+            task.update(self.extra)
+        return task
+
+    def copy(self):
+        record = TaskRecord.__new__(TaskRecord)
+        record.id = self.id
+        record.text = self.text
+        record.completed = self.completed
+        record.created = self.created
+        record.auto_tracked = self.auto_tracked
+        record.app_name = self.app_name
+        record.window_name = self.window_name
+        record.extra = dict(self.extra) if self.extra else None
+        return record
+
+    @property
+    def created_at(self):
+        return decode_time(self.created)
+
+    # Mapping interface
+
+    def __getitem__(self, key):
+        if key in PLAIN_FIELDS:
+            return getattr(self, key)
+        if key == 'created_at':
+            return decode_time(self.created)
+        if key in OPTIONAL_FIELDS:
+            value = getattr(self, key)
+            if value is not None:
+                return value
+        elif self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in INTERNED_FIELDS:
+            setattr(self, key, sys.intern(value))
+        elif key == 'created_at':
+            self.created = encode_time(value)
+        elif key in FIELDS:
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __delitem__(self, key):
+        if key in OPTIONAL_FIELDS and getattr(self, key) is not None:
+            setattr(self, key, None)
+        elif self.extra and key in self.extra:
+            del self.extra[key]
+            if not self.extra:
+                self.extra = None
+        elif key in FIELDS:
+            raise KeyError(f"{key} is required in a task")
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.to_dict())
+
+    def __len__(self):
+        return (5 + (self.auto_tracked is not None) + (self.id is not None)
+                + (len(self.extra) if self.extra else 0))
+
+    def __repr__(self):
+        return f"TaskRecord({self.to_dict()!r})"
+
+
+FIELDS = frozenset(('text', 'completed', 'created_at', 'auto_tracked', 'app_name',
+                    'window_name', 'id'))
+PLAIN_FIELDS = frozenset(('text', 'completed', 'app_name', 'window_name'))
+INTERNED_FIELDS = frozenset(('text', 'app_name', 'window_name'))
+OPTIONAL_FIELDS = frozenset(('auto_tracked', 'id'))
+
+
+def encode_time(created_at):
+    # "YYYY-MM-DD HH:MM:SS" -> seconds since the epoch. Anything else is
+    # kept as it is, boxed in a tuple so it can't be mistaken for seconds.
+    if type(created_at) is str and len(created_at) == 19 and created_at[10] == " ":
+        day = DAYS.get(created_at[:10])
+        if day is None:
+            day = parse_date(created_at[:10])
+        minutes = MINUTE_VALUES.get(created_at[11:16])
+        second = TWO_DIGIT_VALUES.get(created_at[17:])
+        if day is not None and minutes is not None and second is not None and created_at[16] == ":":
+            return day * 86400 + minutes * 60 + second
+    return (created_at,)
+
+
+def parse_date(text):
+    try:
+        date = datetime.strptime(text, "%Y-%m-%d")
+    except ValueError:
+        return None
+    if str(date.date()) != text:
+        return None
+    day = DAYS[text] = (date - EPOCH).days
+    DATES[day] = text
+    return day
+
+
+def decode_time(created):
+    if type(created) is not int:
+        return created[0]
+    day, seconds = divmod(created, 86400)
+    date = DATES.get(day)
+    if date is None:
+        date = DATES[day] = str((EPOCH + day * DAY).date())
+        DAYS[date] = day
+    minutes, second = divmod(seconds, 60)
+    return f"{date} {MINUTES[minutes]}:{TWO_DIGITS[second]}"
+
+
+# Parsing and formatting dates dominates converting tasks, and a history
+# spans few distinct days, so dates are looked up instead; times of day
+# go through tables of every "HH:MM" and "SS"
+DATES = {}  # days since the epoch -> "YYYY-MM-DD"
+DAYS = {}   # "YYYY-MM-DD" -> days since the epoch
+TWO_DIGITS = [f"{n:02d}" for n in range(60)]
+TWO_DIGIT_VALUES = {text: n for n, text in enumerate(TWO_DIGITS)}
+MINUTES = [f"{n // 60:02d}:{n % 60:02d}" for n in range(24 * 60)]
+MINUTE_VALUES = {text: n for n, text in enumerate(MINUTES)}
+
+
+class TaskStore:
+    # In-memory task list with stable task IDs and hash indexes, persisted
+    # through a JournalStore.
+    #
+    # Tasks are TaskRecords in insertion order (journal.items); each gets
+    # an integer 'id' that never changes and is never reused, even after
+    # the task moves to the archive (the next ID is kept in the journal's
+    # meta for that). Lookups by (app, normalized
+    # window title, completed) and by (app, completed) are O(1), and the
+    # completed count is maintained as tasks change instead of being
+    # recounted. All changes go through add/update/remove/clear so the
+    # indexes stay in step, and each bumps version so views know when to
+    # redraw.
+
+    def __init__(self, journal):
+        self.journal = journal
+        self.by_id = {}
+        self.by_key = {}  # (app_name, normalized window, completed) -> {task id: None}
+        self.keys = {}    # task id -> its by_key key
+        self.by_app = {}  # (app_name, completed) -> {task id: None}
+        self.completed = 0
+        self.next_id = 1
+        self.version = 0
+
+    def load(self):
+        items = self.journal.load()
+        self.next_id = max(self.journal.meta.get('next_id', 1),
+                           max((task['id'] for task in items if 'id' in task), default=0) + 1)
+
+        # Tasks saved before IDs existed get one now
+        missing = [task for task in items if 'id' not in task]
+        for task in missing:
+            task['id'] = self._new_id()
+        if missing:
+            self.journal.compact()
+
+        for task in items:
+            self._index(task)
+        self.version += 1
+        return self
+
+    def _new_id(self):
+        task_id = self.next_id
+        self.next_id += 1
+        return task_id
+
+    def _keep_next_id(self):
+        # Removed tasks keep their IDs in the archive, so the next ID has to
+        # survive a restart even when the newest tasks are gone
+        if self.journal.meta.get('next_id') != self.next_id:
+            self.journal.set_meta(next_id=self.next_id)
+
+    # Read access
+
+    def __iter__(self):
+        return iter(self.journal.items)
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def get(self, task_id):
+        return self.by_id.get(task_id)
+
+    @property
+    def active(self):
+        return len(self.by_id) - self.completed
+
+    def find(self, app_name, window_name, completed=False):
+        # Window titles are compared normalized: "(3) Inbox" finds "(4) Inbox"
+        bucket = self.by_key.get((app_name, normalize_title(window_name), completed))
+        return self.by_id[next(iter(bucket))] if bucket else None
+
+    def find_app(self, app_name, completed=False):
+        bucket = self.by_app.get((app_name, completed))
+        return self.by_id[next(iter(bucket))] if bucket else None
+
+    # Changes
+
+    def add(self, task):
+        if not isinstance(task, TaskRecord):
+            task = TaskRecord.from_dict(task)
+        task['id'] = self._new_id()
+        self.journal.append(task)
+        self._index(task)
+        self.version += 1
+        return task
+
+    def update(self, task, **fields):
+        self._unindex(task)
+        self.journal.update(task, **fields)
+        self._index(task)
+        self.version += 1
+
+    def remove(self, task_ids):
+        task_ids = [task_id for task_id in task_ids if task_id in self.by_id]
+        if not task_ids:
+            return
+        for task_id in task_ids:
+            self._unindex(self.by_id[task_id])
+        self._keep_next_id()
+        self.journal.remove(task_ids)
+        self.version += 1
+
+    def clear(self):
+        self._keep_next_id()
+        self.journal.replace([])
+        self.by_id.clear()
+        self.by_key.clear()
+        self.keys.clear()
+        self.by_app.clear()
+        self.completed = 0
+        self.version += 1
+
+    # Index maintenance
+
+    def _index(self, task):
+        task_id = task['id']
+        self.by_id[task_id] = task
+        key = (task['app_name'], normalize_title(task['window_name']), task['completed'])
+        self.keys[task_id] = key
+        self.by_key.setdefault(key, {})[task_id] = None
+        self.by_app.setdefault((task['app_name'], task['completed']), {})[task_id] = None
+        if task['completed']:
+            self.completed += 1
+
+    def _unindex(self, task):
+        task_id = task['id']
+        del self.by_id[task_id]
+        self._discard(self.by_key, self.keys.pop(task_id), task_id)
+        self._discard(self.by_app, (task['app_name'], task['completed']), task_id)
+        if task['completed']:
+            self.completed -= 1
+
+    def _discard(self, index, key, task_id):
+        bucket = index.get(key)
+        if bucket is not None:
+            bucket.pop(task_id, None)
+            if not bucket:
+                del index[key]
@@ -0,0 +1,296 @@
+def task_type(task):
+    # "Editing: Report.docx" -> "Editing"
+    return task['text'].split(':')[0].strip()
+
+
+def group_key(task, org_method):
+    if org_method == "Type":
+        # Group by the type extracted from the task text, then by application
+        return (task_type(task), task['app_name'])
+    # Application organization
+    return (task['app_name'],)
+
+
+class TaskTreeRenderer:
+    # Keeps a ttk.Treeview in sync with the task list without holding a
+    # Tk item for every task.
+    #
+    # Group nodes are always present and show how many tasks they hold.
+    # The innermost groups start collapsed with a single placeholder child;
+    # their rows are only inserted when the group is opened, page_size at a
+    # time, with a "more" row at the end that loads the next page when it
+    # is clicked or scrolled into view. Closing a group drops its rows
+    # again. Lists of up to auto_open tasks are shown fully expanded.
+    #
+    # Each render diffs the task list against what is on screen and
+    # applies only the inserts, updates, moves and deletes that are needed.
+
+    def __init__(self, tree, page_size=100, auto_open=200):
+        self.tree = tree
+        self.page_size = page_size
+        self.auto_open = auto_open
+        self.groups = {}        # group path tuple -> item id
+        self.group_paths = {}   # item id -> group path tuple
+        self.headers = {}       # group path -> header text on screen
+        self.rows = {}          # task id -> [item id, group path, state]
+        self.item_ids = {}      # item id -> task id
+        self.child_groups = {}  # group path -> ordered child group paths
+        self.layout = {}        # innermost group path -> ordered tasks
+        self.loaded = {}        # open group path -> number of rows to show
+        self.shown = {}         # open group path -> task ids on screen
+        self.placeholders = {}  # closed group path -> placeholder item id
+        self.more = {}          # open group path -> "more" item id
+        self.more_paths = {}    # "more" item id -> group path
+        self.rendered_version = None
+
+    def reset(self):
+        self.tree.delete(*self.tree.get_children())
+        for index in (self.groups, self.group_paths, self.headers, self.rows, self.item_ids,
+                      self.loaded, self.shown, self.placeholders, self.more, self.more_paths):
+            index.clear()
+        self.child_groups = {}
+        self.layout = {}
+        self.rendered_version = None
+
+    def task_id_for_item(self, item):
+        return self.item_ids.get(item)
+
+    def render(self, tasks, group_key, version):
+        # Nothing changed since the last render
+        if version == self.rendered_version:
+            return False
+
+        # Group tasks, keeping groups in order of first appearance
+        layout = {}
+        child_groups = {}
+        for task in tasks:
+            path = group_key(task)
+            if path not in layout:
+                layout[path] = []
+                for depth in range(1, len(path) + 1):
+                    prefix = path[:depth]
+                    siblings = child_groups.setdefault(prefix[:-1], [])
+                    if prefix not in siblings:
+                        siblings.append(prefix)
+            layout[path].append(task)
+
+        counts = {}
+        for path, group_tasks in layout.items():
+            # Sort tasks: completed tasks at the bottom
+            group_tasks.sort(key=lambda x: x['completed'])
+            for depth in range(1, len(path) + 1):
+                counts[path[:depth]] = counts.get(path[:depth], 0) + len(group_tasks)
+        auto_open = sum(len(group_tasks) for group_tasks in layout.values()) <= self.auto_open
+
+        # Groups are ordered by their first task, which can change on its own
+        dirty = {path for path, children in child_groups.items()
+                 if self.child_groups.get(path) != children}
+        self.child_groups = child_groups
+        self.layout = layout
+
+        # Drop rows that no open group shows any more
+        for path in [path for path in self.loaded if path not in layout]:
+            del self.loaded[path]
+            self.shown.pop(path, None)
+            self._drop_more(path)
+        keep = set()
+        for path, limit in self.loaded.items():
+            keep.update(task['id'] for task in layout[path][:limit])
+        # (rows in groups about to be dropped go too, even if shown elsewhere now)
+        stale = [self.rows.pop(task_id)[0] for task_id, row in list(self.rows.items())
+                 if task_id not in keep or row[1] not in layout]
+        for item in stale:
+            del self.item_ids[item]
+        if stale:
+            self.tree.delete(*stale)
+
+        # Drop groups that no longer hold any task, deepest first
+        for path in sorted(self.groups, key=len, reverse=True):
+            if path not in child_groups and path not in layout:
+                item = self.groups.pop(path)
+                del self.group_paths[item]
+                self.headers.pop(path, None)
+                self.placeholders.pop(path, None)
+                self.tree.delete(item)
+
+        # Create new groups and keep the counts in their headers current
+        opened = []
+        for path in layout:
+            self._ensure_group(path, counts, dirty, auto_open, opened)
+        for path, count in counts.items():
+            header = self._header(path, count)
+            if self.headers[path] != header:
+                self.tree.item(self.groups[path], text=header)
+                self.headers[path] = header
+
+        for path in opened:
+            self.loaded[path] = max(self.page_size, len(layout[path]))
+        for path in self.loaded:
+            self._fill(path, dirty)
+
+        self._reorder(dirty)
+        self.rendered_version = version
+        return True
+
+    # Lazy loading, driven by the view
+
+    def expand(self, item):
+        # <<TreeviewOpen>>: insert the first page of an innermost group
+        path = self.group_paths.get(item)
+        if path is None or path not in self.layout or path in self.loaded:
+            return False
+        self.loaded[path] = self.page_size
+        dirty = set()
+        self._fill(path, dirty)
+        self._reorder(dirty)
+        return True
+
+    def collapse(self, item):
+        # <<TreeviewClose>>: drop the group's rows, leaving the placeholder
+        path = self.group_paths.get(item)
+        if path is None or path not in self.loaded:
+            return False
+        del self.loaded[path]
+        items = []
+        for task_id in self.shown.pop(path, []):
+            row_item = self.rows.pop(task_id)[0]
+            del self.item_ids[row_item]
+            items.append(row_item)
+        self._drop_more(path)
+        if items:
+            self.tree.delete(*items)
+        self._ensure_placeholder(path)
+        return True
+
+    def is_more(self, item):
+        return item in self.more_paths
+
+    def load_more(self, item):
+        # The "more" row was clicked or scrolled into view
+        path = self.more_paths.get(item)
+        if path is None:
+            return False
+        self.loaded[path] += self.page_size
+        dirty = set()
+        self._fill(path, dirty)
+        self._reorder(dirty)
+        return True
+
+    def load_visible(self):
+        # Load the next page of every open group whose "more" row is on screen
+        loaded = False
+        for item in list(self.more_paths):
+            if self.tree.bbox(item):
+                loaded = self.load_more(item) or loaded
+        return loaded
+
+    # Helpers
+
+    def _ensure_group(self, path, counts, dirty, auto_open, opened):
+        parent = ''
+        for depth in range(1, len(path) + 1):
+            prefix = path[:depth]
+            item = self.groups.get(prefix)
+            if item is None:
+                header = self._header(prefix, counts[prefix])
+                item = self.tree.insert(parent, 'end', text=header, open=auto_open)
+                self.groups[prefix] = item
+                self.group_paths[item] = prefix
+                self.headers[prefix] = header
+                dirty.add(prefix[:-1])
+                if prefix == path:
+                    if auto_open:
+                        opened.append(path)
+                    else:
+                        self._ensure_placeholder(path)
+            parent = item
+        return parent
+
+    def _header(self, path, count):
+        return f"{path[-1]} ({count})"
+
+    def _ensure_placeholder(self, path):
+        if path not in self.placeholders:
+            self.placeholders[path] = self.tree.insert(self.groups[path], 'end', text="Loading…")
+
+    def _fill(self, path, dirty):
+        # Bring the rows of one open group in line with its first
+        # loaded[path] tasks, plus a "more" row if some are left
+        placeholder = self.placeholders.pop(path, None)
+        if placeholder is not None:
+            self.tree.delete(placeholder)
+
+        parent = self.groups[path]
+        group_tasks = self.layout[path]
+        visible = group_tasks[:self.loaded[path]]
+        shown = []
+        for task in visible:
+            task_id = task['id']
+            shown.append(task_id)
+            state = (task['text'], task['completed'])
+            row = self.rows.get(task_id)
+            if row is None:
+                item = self.tree.insert(parent, 'end', **self._row_options(task))
+                self.rows[task_id] = [item, path, state]
+                self.item_ids[item] = task_id
+                dirty.add(path)
+                continue
+
+            item, old_path, old_state = row
+            if old_path != path:
+                # The task's type or app changed: move it to its new group
+                self.tree.move(item, parent, 'end')
+                row[1] = path
+                dirty.add(path)
+                dirty.add(old_path)
+            if old_state != state:
+                self.tree.item(item, **self._row_options(task))
+                row[2] = state
+                if old_state[1] != state[1]:
+                    dirty.add(path)
+        if shown != self.shown.get(path):
+            dirty.add(path)
+        self.shown[path] = shown
+
+        remaining = len(group_tasks) - len(visible)
+        if remaining <= 0:
+            self._drop_more(path)
+            return
+        text = f"… {remaining} more"
+        item = self.more.get(path)
+        if item is None:
+            item = self.tree.insert(parent, 'end', text=text, tags=('more',))
+            self.more[path] = item
+            self.more_paths[item] = path
+            dirty.add(path)
+        else:
+            self.tree.item(item, text=text)
+
+    def _drop_more(self, path):
+        item = self.more.pop(path, None)
+        if item is not None:
+            del self.more_paths[item]
+            if path in self.groups:
+                self.tree.delete(item)
+
+    def _reorder(self, dirty):
+        # Restore the expected order wherever something was added or moved
+        for path in dirty:
+            if path in self.loaded:
+                wanted = [self.rows[task_id][0] for task_id in self.shown[path]]
+                if path in self.more:
+                    wanted.append(self.more[path])
+            elif path in self.child_groups:
+                wanted = [self.groups[child] for child in self.child_groups[path]]
+            else:
+                continue
+            parent = self.groups.get(path, '')
+            if list(self.tree.get_children(parent)) != wanted:
+                for index, item in enumerate(wanted):
+                    self.tree.move(item, parent, index)
+
+    def _row_options(self, task):
+        status = "✓" if task['completed'] else "○"
+        # Add visual styling for completed tasks
+        tags = ('completed',) if task['completed'] else ()
+        return {'text': task['text'], 'values': (status,), 'tags': tags}
@@ -0,0 +1,49 @@
+from classifier import TitleClassifier
+from tracker import Tracker
+
+MAIL = [
+    ("Hi - x@gmail.com - Gmail", "📧 Responding to Hi email"),
+    ("Invoice 42 - x@gmail.com - Gmail", "📧 Paying invoice 42"),
+    ("Team lunch on Friday - x@gmail.com - Gmail", "📧 Planning the team lunch"),
+    ("Flight confirmation - x@gmail.com - Gmail", "📧 Checking the flight booking"),
+    ("Meeting notes - Google Docs", "📝 Taking meeting notes"),
+    ("Holiday packing list - Google Docs", "📝 Making a packing list"),
+    ("Budget 2025 - Google Docs", "📝 Planning the budget"),
+    ("Quarterly report draft - Google Docs", "📝 Writing the quarterly report"),
+    ("Quarterly report final - Google Docs", "📝 Writing the quarterly report"),
+]
+
+
+def make_classifier():
+    classifier = TitleClassifier()
+    for window, title in MAIL:
+        classifier.learn("Google Chrome", window, title)
+    return classifier
+
+
+def test_agreeing_neighbors_give_a_title():
+    classifier = make_classifier()
+    assert classifier.classify("Google Chrome", "Quarterly report - Google Docs") == \
+        "📝 Writing the quarterly report"
+
+
+def test_app_suffix_alone_is_not_enough():
+    classifier = make_classifier()
+    assert classifier.classify("Google Chrome", "Yo - x@gmail.com - Gmail") is None
+    # Even with a single example for the app
+    classifier = TitleClassifier()
+    classifier.learn("Google Chrome", *MAIL[0])
+    assert classifier.classify("Google Chrome", "Yo - x@gmail.com - Gmail") is None
+
+
+def test_unrelated_title_falls_through_to_the_describer(tmp_path):
+    tracker = Tracker(str(tmp_path / "tasks.json"), str(tmp_path / "archive.json"),
+                      cache_file=str(tmp_path / "description_cache.db"),
+                      patterns_file=str(tmp_path / "patterns.json"))
+    try:
+        for window, title in MAIL:
+            tracker.classifier.learn("Google Chrome", window, title)
+        assert tracker.describe_locally("Google Chrome", "Yo - x@gmail.com - Gmail") is None
+        assert tracker.classifier.stats()['predictions'] == 1
+    finally:
+        tracker.close()
@@ -0,0 +1,57 @@
+import os
+
+from probes import RecordingProbe, ScriptedProbe
+from scheduler import SamplingScheduler
+from tracker import Tracker
+
+
+def make_tracker(tmp_path, probe):
+    tracker = Tracker(str(tmp_path / "tasks.json"), str(tmp_path / "archive.json"),
+                      cache_file=str(tmp_path / "description_cache.db"),
+                      patterns_file=str(tmp_path / "patterns.json"), probe=probe)
+    # No sleeping, and an idle check before every probe
+    tracker.scheduler = SamplingScheduler(min_interval=0, max_interval=0,
+                                          paused_interval=0, idle_check_every=0)
+    return tracker
+
+
+def test_replay_is_unchanged_by_idle_checks(tmp_path):
+    script = [("Mail", "Inbox"), ("Safari", "News", 0), ("Notes", "Ideas", 600),
+              ("Terminal", "bash"), ("Finder", "Downloads", 5)]
+    probe = ScriptedProbe(script)
+    tracker = make_tracker(tmp_path, probe)
+
+    seen = []
+    probed = probe.probe
+
+    def probe_once():
+        sample = probed()
+        seen.append(sample)
+        if len(seen) == len(script):
+            tracker.stopping.set()
+        return sample
+
+    probe.probe = probe_once
+    try:
+        tracker.monitor_applications()
+    finally:
+        tracker.close()
+
+    assert seen == [sample[:2] for sample in script]
+    # The idle sample paused the tracker for one check, then it resumed
+    assert tracker.scheduler.wakeups == len(script) + 1
+
+
+def test_recording_replays_the_same_samples(tmp_path):
+    path = str(tmp_path / "session.jsonl")
+    script = [("Mail", "Inbox"), ("Safari", "News"), ("Notes", "Ideas")]
+    recorder = RecordingProbe(ScriptedProbe(script), path)
+    for _ in script:
+        recorder.idle_seconds()
+        recorder.probe()
+        recorder.idle_seconds()
+    recorder.close()
+
+    assert os.path.exists(path)
+    replay = ScriptedProbe.from_file(path)
+    assert [replay.probe() for _ in script] == script
@@ -0,0 +1,44 @@
+import json
+
+from relabel import Checkpoint
+
+
+def test_resume_after_a_cut_off_line(tmp_path):
+    path = str(tmp_path / "relabel.checkpoint")
+    checkpoint = Checkpoint(path)
+    checkpoint.add({"mail:inbox": "📧 Reading email", "slack:general": "💬 Chatting"})
+    checkpoint.close()
+    # Interrupted in the middle of writing the next record
+    with open(path, 'a') as f:
+        f.write('{"key": "docs:plan", "ti')
+
+    checkpoint = Checkpoint(path)
+    assert checkpoint.titles == {"mail:inbox": "📧 Reading email", "slack:general": "💬 Chatting"}
+    checkpoint.add({"docs:plan": "📝 Writing the plan"})
+    checkpoint.close()
+    checkpoint = Checkpoint(path)
+    checkpoint.add({"notes:ideas": "🗒️ Writing down ideas"})
+    checkpoint.close()
+
+    checkpoint = Checkpoint(path)
+    checkpoint.close()
+    assert checkpoint.titles == {"mail:inbox": "📧 Reading email", "slack:general": "💬 Chatting",
+                                 "docs:plan": "📝 Writing the plan",
+                                 "notes:ideas": "🗒️ Writing down ideas"}
+    with open(path, 'r') as f:
+        assert [json.loads(line)['key'] for line in f] == \
+            ["mail:inbox", "slack:general", "docs:plan", "notes:ideas"]
+
+
+def test_resume_after_a_line_without_newline(tmp_path):
+    path = str(tmp_path / "relabel.checkpoint")
+    with open(path, 'w') as f:
+        f.write('{"key": "mail:inbox", "title": "📧 Reading email"}')
+
+    checkpoint = Checkpoint(path)
+    checkpoint.add({"docs:plan": "📝 Writing the plan"})
+    checkpoint.close()
+
+    checkpoint = Checkpoint(path)
+    checkpoint.close()
+    assert checkpoint.titles == {"mail:inbox": "📧 Reading email", "docs:plan": "📝 Writing the plan"}
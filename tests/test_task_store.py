@@ -0,0 +1,33 @@
+import json
+
+from journal import JournalStore, to_json
+from task_store import TaskRecord, TaskStore
+
+
+def load_store(path):
+    return TaskStore(JournalStore(path, record=TaskRecord)).load()
+
+
+def make_task(n):
+    return {'text': f"Task {n}", 'completed': False, 'created_at': "2025-01-06 09:00:00",
+            'app_name': "Notes", 'window_name': f"Note {n}"}
+
+
+def test_ids_survive_a_crash_between_snapshot_and_journal(tmp_path):
+    path = str(tmp_path / "tasks.json")
+    store = load_store(path)
+    for n in range(3):
+        store.add(make_task(n))
+    # The two newest tasks move to the archive
+    store.remove([2, 3])
+    store.journal.close()
+
+    # Crash right after a compaction replaced the snapshot: the journal
+    # still belongs to the old one
+    with open(path, 'w') as f:
+        json.dump(store.journal.items, f, default=to_json)
+
+    store = load_store(path)
+    assert [task['id'] for task in store] == [1]
+    assert store.add(make_task(3))['id'] == 4
+    store.journal.close()
@@ -0,0 +1,137 @@
+import random
+import re
+import zlib
+
+# Window titles carry noise that changes while the activity stays the
+# same: unread badges ("(3) Inbox"), counters, clocks and call timers,
+# unsaved-file markers. normalize_title() strips it so such titles share
+# one cache key and one task; NearDuplicateIndex finds the remaining
+# near-identical titles (a changed word or two) among those seen before.
+
+# Noise only counts at badge positions: at the start or end of the title,
+# or next to a separator ("Inbox (4) - Outlook", "Zoom | 12:34"). In the
+# middle of a name, and right before a file extension, counters and dates
+# are part of what the window is ("Resume (1).pdf", "Notes 2025-01-06.docx").
+NOISE_ITEM = r"""(?:
+    [(\[]\s*\d{1,3}\+?(?:\s+(?:new|unread)\b[^)\]]*)?[)\]]     # (12) [3+] (4 unread)
+  | [•●◉*✱]                                                   # unsaved marker
+  | \b\d+\+?\s+(?:new|unread)(?:\s+(?:messages?|notifications?|emails?|items?))?\b
+  | \b\d{4}-\d{2}-\d{2}(?:[T\s]\d{1,2}[:.]\d{2}(?:[:.]\d{2})?)?\b   # dates, with time
+  | \b\d{1,2}/\d{1,2}/\d{2,4}\b
+  | \b\d{1,2}:\d{2}(?::\d{2})?(?:\s?[ap]\.?m\b\.?)?                # clocks and call timers
+)(?!\.\w)"""
+NOISE_START = r"(?:^|(?<=[-–—|·:,]\s))"
+NOISE_END = r"(?=\s*$|\s+[-–—|·:,](?:\s|$))"
+
+# One pass over the title. The lookahead lets the scan skip quickly over
+# positions where no noise can start. Noise that is a whole segment takes
+# the separator after it along, so "a - 10:32 - b" becomes "a - b".
+NOISE = re.compile(rf"""(?=[(\[\d•●◉*✱])(?:
+    {NOISE_START}{NOISE_ITEM}\s+[-–—|·:,](?=\s)
+  | {NOISE_START}{NOISE_ITEM}
+  | {NOISE_ITEM}{NOISE_END}
+)""", re.VERBOSE | re.IGNORECASE)
+
+# Titles without any of these have no noise to strip
+MAY_HAVE_NOISE = re.compile(r"[\d•●◉*✱]")
+
+# Separators left dangling once the noise is gone
+EDGES = " \t-–—|·:,"
+
+
+def normalize_title(title):
+    # "(3) Inbox - Outlook" and "Inbox (4) - Outlook" -> "inbox - outlook",
+    # "Standup - 10:32 - Zoom" -> "standup - zoom", but "Resume (1).pdf"
+    # and "Meeting notes 2025-01-06.docx" stay distinct
+    if MAY_HAVE_NOISE.search(title):
+        title_without_noise = NOISE.sub(" ", title)
+    else:
+        title_without_noise = title
+    normalized = " ".join(title_without_noise.split()).strip(EDGES).casefold()
+    return normalized or " ".join(title.split()).casefold()
+
+
+def is_fallback_title(task):
+    # Titles the tracker makes up itself when no pattern or AI title is
+    # available, or to show time spent in an app
+    app_name, window_name, text = task['app_name'], task['window_name'], task['text']
+    if text in (f"Working on: {window_name}", f"Using {app_name}: {window_name}",
+                f"Editing: {window_name}", f"Viewing: {window_name}"):
+        return True
+    return text.startswith(f"Using {app_name} (") and text.endswith(" minutes)")
+
+
+def description_key(app_name, window_name):
+    # Description cache key: titles that normalize alike share a title
+    return f"{app_name}:{normalize_title(window_name)}"
+
+
+def shingles(title):
+    # Words and word pairs of a normalized title
+    words = re.findall(r"\w+", title)
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class NearDuplicateIndex:
+    # MinHash LSH over title shingles. Each entry is signed with num_perm
+    # min-hashes (crc32 of each shingle XORed with a fixed random mask per
+    # hash) split into bands; titles that agree on a whole band are
+    # candidates, and candidates are confirmed with their exact Jaccard
+    # similarity. Entries only match others from the same app.
+
+    def __init__(self, threshold=0.8, num_perm=18, bands=6, seed=1):
+        self.threshold = threshold
+        self.rows = num_perm // bands
+        self.bands = bands
+        rng = random.Random(seed)
+        self.masks = [rng.getrandbits(32) for _ in range(self.rows * bands)]
+        self.buckets = {}  # (app, band, band signature) -> {key: None}
+        self.entries = {}  # key -> (shingles, bucket keys)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def _buckets(self, app_name, words):
+        masks = self.masks
+        hashed = [[h ^ mask for mask in masks] for h in map(zlib.crc32, map(str.encode, words))]
+        signature = list(map(min, zip(*hashed))) if hashed else [0] * len(masks)
+        return [(app_name, band, tuple(signature[band * self.rows:(band + 1) * self.rows]))
+                for band in range(self.bands)]
+
+    def add(self, key, app_name, title):
+        self.discard(key)
+        words = shingles(title)
+        buckets = self._buckets(app_name, words)
+        for bucket in buckets:
+            self.buckets.setdefault(bucket, {})[key] = None
+        self.entries[key] = (words, buckets)
+
+    def discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for bucket in entry[1]:
+            keys = self.buckets[bucket]
+            del keys[key]
+            if not keys:
+                del self.buckets[bucket]
+
+    def query(self, app_name, title):
+        # The most similar key at or above the threshold, or None
+        words = shingles(title)
+        candidates = set()
+        for bucket in self._buckets(app_name, words):
+            candidates.update(self.buckets.get(bucket, ()))
+        best, best_score = None, self.threshold
+        for key in candidates:
+            score = jaccard(words, self.entries[key][0])
+            if score > best_score or (score == best_score and best is None):
+                best, best_score = key, score
+        return best
@@ -0,0 +1,597 @@
+import os
+import queue
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from threading import Event, Lock, Thread
+
+from archive_db import DeferredArchive
+from classifier import TitleClassifier
+from describer import DescriptionPipeline
+from description_cache import DescriptionCache
+from journal import JournalStore
+from metrics import METRICS, enabled_from_env
+from patterns import load_pattern_rules
+from persistence import WRITER
+from probes import create_probe
+from scheduler import SamplingScheduler
+from task_store import TaskRecord, TaskStore
+from titles import description_key
+
+# Frontmost apps that are the helper itself (or the terminal running it)
+HELPER_APPS = ("Python", "Terminal")
+
+# Commands other threads (and IPC clients) may run through call()
+API = ('add_task', 'toggle_task', 'delete_task', 'clear_completed', 'archive_all',
+       'snapshot', 'status', 'stats', 'shutdown')
+
+
+class Tracker:
+    # The tracking engine, without any GUI: window monitoring, task
+    # storage, title generation and persistence.
+    #
+    # One thread owns the tracker state; it is whichever thread calls
+    # tick()/run() (the Tk thread inside the GUI, the main thread of
+    # daemon.py). Everything else talks to it through the events queue:
+    # the monitor thread posts focus changes, describer workers post
+    # finished titles, and IPC handlers post commands via call() and wait
+    # for the result. Nothing outside the owner thread touches the tasks.
+
+    def __init__(self, tasks_file="tasks.json", archive_file="archive.json",
+                 cache_file="description_cache.db", patterns_file=None,
+                 probe=None, archive_backend=None):
+        self.events = queue.Queue()
+        self.stopping = Event()
+        self.monitor_thread = None
+        # Lets clients tell a restarted tracker from the one they synced with
+        self.session = f"{os.getpid()}-{time.time():.0f}"
+
+        # The OpenAI client is created on the first AI title request
+        self.openai_client = None
+        self.openai_lock = Lock()
+
+        # AI titles are generated on worker threads and applied by the owner
+        self.describer = DescriptionPipeline(
+            self.request_description,
+            max_workers=int(os.environ.get("DESCRIBER_WORKERS", 4)),
+            timeout=float(os.environ.get("DESCRIBER_TIMEOUT", 15)),
+            retries=int(os.environ.get("DESCRIBER_RETRIES", 2))
+        )
+
+        # Persistent cache for AI task descriptions, bounded with LRU eviction.
+        # Keys use normalized window titles, and near-identical titles of the
+        # same app share an entry.
+        self.description_cache = DescriptionCache(
+            cache_file,
+            max_entries=int(os.environ.get("DESCRIPTION_CACHE_SIZE", 5000)),
+            ttl=float(os.environ.get("DESCRIPTION_CACHE_TTL_DAYS", 30)) * 24 * 3600,
+            similarity=float(os.environ.get("DESCRIPTION_SIMILARITY", 0.8))
+        )
+
+        # Local title model, asked after the cache and before OpenAI. It
+        # learns every AI title as it arrives; preload_archive() also
+        # trains it from the tasks and archive in the background.
+        self.classifier = TitleClassifier(
+            threshold=float(os.environ.get("CLASSIFIER_CONFIDENCE", 0.6))
+        )
+
+        # Window title patterns, compiled into a single matcher. User rules
+        # from patterns.json are merged in and reloaded when the file changes.
+        self.patterns_file = patterns_file or os.environ.get("PATTERNS_FILE", "patterns.json")
+        self.patterns_mtime = None
+        self.pattern_rules = None
+        self.reload_patterns()
+
+        # Tasks (and the JSON archive) are journaled: changes are appended
+        # to a "<file>.journal" and the JSON files are only rewritten
+        # (atomically) when the journal is compacted. All of it is written
+        # by the shared background writer, this long after the last change.
+        WRITER.delay = float(os.environ.get("HELPER_WRITE_DELAY", WRITER.delay))
+        self.tasks_file = tasks_file
+        self.archive_file = archive_file
+        self.task_journal = JournalStore(self.tasks_file, record=TaskRecord)
+        self.tasks = self.load_tasks()
+
+        # Journaled JSON by default, or SQLite with ARCHIVE_BACKEND=sqlite.
+        # Only clearing and archiving need it, so it is loaded on demand
+        # (or ahead of time with preload_archive)
+        self.archive_store = DeferredArchive(self.archive_file, archive_backend)
+
+        # Track active applications and their details. last_active_* belong
+        # to the monitor thread, stored_* to the owner thread.
+        self.active_apps = {}
+        self.last_active_app = None
+        self.last_active_window = None
+        self.app_start_time = {}
+        self.window_start_time = {}
+        self.MIN_ACTIVE_TIME = 20  # Minimum time in seconds before adding a task
+        self.stored_app = None
+        self.stored_window = None
+
+        # Active-window backend, chosen with HELPER_PROBE
+        self.probe = probe or create_probe()
+        self.scheduler = SamplingScheduler(
+            idle_after=float(os.environ.get("IDLE_AFTER_SECONDS", 300))
+        )
+
+        self.metrics_file = os.environ.get("HELPER_METRICS_FILE")
+        self.metrics_written_at = 0
+
+    def start(self):
+        # Start monitoring thread
+        self.monitor_thread = Thread(target=self.monitor_applications, daemon=True)
+        self.monitor_thread.start()
+
+        # Expose metrics locally if requested (HELPER_METRICS and friends)
+        if not METRICS.enabled:
+            METRICS.enabled = enabled_from_env()
+        self.register_gauges()
+        metrics_port = os.environ.get("HELPER_METRICS_PORT")
+        if metrics_port:
+            METRICS.serve(int(metrics_port))
+        return self
+
+    def preload_archive(self):
+        self.archive_store.start()
+        if self.classifier.threshold:
+            tasks = list(self.tasks)
+            Thread(target=self.train_classifier, args=(tasks,), daemon=True).start()
+
+    def train_classifier(self, tasks):
+        # Newest first: current tasks, then the archive (streamed, and only
+        # as far back as the model has room for)
+        try:
+            self.classifier.train(reversed(tasks))
+            self.classifier.train(self.archive_store.iter_newest())
+        except Exception as e:
+            print(f"Error training the title classifier: {e}")
+
+    # Event loop
+
+    def post(self, kind, *args):
+        # Safe from any thread
+        self.events.put((kind,) + args)
+
+    def call(self, name, timeout=30, **args):
+        # Run an API command on the owner thread and wait for its result
+        if name not in API:
+            raise ValueError(f"Unknown command: {name}")
+        reply = Future()
+        self.post('call', name, args, reply)
+        return reply.result(timeout)
+
+    def tick(self):
+        # Periodic work for the owner thread
+        self.reload_patterns()
+        self.process_events()
+        self.write_metrics()
+
+    def run(self):
+        # Owner loop for a headless tracker; returns once stop() is called
+        while not self.stopping.is_set():
+            try:
+                self.handle_event(self.events.get(timeout=1.0))
+            except queue.Empty:
+                pass
+            self.tick()
+
+    def stop(self):
+        self.stopping.set()
+        self.post('wake')
+
+    def shutdown(self):
+        # API command: ends run() once the reply is sent
+        self.stopping.set()
+        return True
+
+    def process_events(self):
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                return
+            self.handle_event(event)
+
+    def handle_event(self, event):
+        kind = event[0]
+        if kind == 'focus':
+            self.stored_app, self.stored_window = event[1], event[2]
+        elif kind == 'window':
+            self.stored_window = event[1]
+        elif kind == 'description':
+            self.apply_description(event[1], event[2])
+        elif kind == 'call':
+            name, args, reply = event[1:]
+            if not reply.set_running_or_notify_cancel():
+                return
+            try:
+                reply.set_result(getattr(self, name)(**args))
+            except Exception as e:
+                reply.set_exception(e)
+
+    # Persistence
+
+    def load_tasks(self):
+        return TaskStore(self.task_journal).load()
+
+    def load_archive(self):
+        return self.archive_store.load()
+
+    def save_tasks(self):
+        with METRICS.timer("helper_save_seconds", store="tasks"):
+            self.task_journal.compact()
+
+    def save_archive(self):
+        with METRICS.timer("helper_save_seconds", store="archive"):
+            self.archive_store.compact()
+
+    # Monitoring (runs on its own thread)
+
+    def monitor_applications(self):
+        while not self.stopping.is_set():
+            # Don't probe windows at all while the user is away
+            if self.scheduler.check_idle(self.probe):
+                self.scheduler.sleep()
+                continue
+
+            current_app, current_window = self.get_active_application()
+
+            if current_app and current_app != self.last_active_app:
+                self.last_active_app = current_app
+                self.last_active_window = current_window
+                # Store the application if it's not our helper app
+                if current_app not in HELPER_APPS:
+                    self.post('focus', current_app, current_window)
+
+            elif current_app and current_window != self.last_active_window:
+                self.last_active_window = current_window
+                # Update stored window if it's not our helper app
+                if current_app not in HELPER_APPS:
+                    self.post('window', current_window)
+
+            # Back off while nothing changes, speed up after a switch
+            self.scheduler.observe((current_app, current_window))
+            self.scheduler.sleep()
+
+    def is_browser(self, app_name):
+        return app_name in ["Google Chrome", "Safari", "Firefox", "Microsoft Edge"]
+
+    def get_active_application(self):
+        with METRICS.timer("helper_probe_seconds", backend=self.probe.name):
+            return self.probe.probe()
+
+    @property
+    def paused(self):
+        return self.scheduler.paused
+
+    # Tasks
+
+    def save_app_time(self, app_name):
+        if app_name in self.app_start_time:
+            start_time = self.app_start_time[app_name]
+            duration = datetime.now() - start_time
+            minutes = int(duration.total_seconds() / 60)
+
+            task = self.tasks.find_app(app_name)
+            if task:
+                self.tasks.update(task, text=f"Using {app_name} ({minutes} minutes)")
+
+    def task_exists(self, app_name, window_name):
+        # Check if we already have a task for this exact app and window
+        if self.tasks.find(app_name, window_name):
+            return True
+
+        # For non-browser apps, only allow one active task per app
+        if not self.is_browser(app_name):
+            task = self.tasks.find_app(app_name)
+            if task:
+                # Update the existing task with the new window name
+                if app_name == "Microsoft Word":
+                    text = f"Editing: {window_name}"
+                elif app_name == "Microsoft Excel":
+                    text = f"Working on: {window_name}"
+                elif app_name == "Preview":
+                    text = f"Viewing: {window_name}"
+                else:
+                    text = f"Using {app_name}: {window_name}"
+                self.tasks.update(task, window_name=window_name, text=text)
+                return True
+
+        return False
+
+    def add_task(self, app_name=None, window_name=None):
+        # Defaults to the last app and window seen outside the helper
+        current_app = app_name or self.stored_app
+        current_window = window_name or self.stored_window
+        if not (current_app and current_window):
+            return None
+
+        # Check if task already exists (titles differing only in badges,
+        # counters or clocks count as the same)
+        if self.tasks.find(current_app, current_window):
+            return None
+
+        # Use a pattern or cached title if we have one, otherwise insert
+        # the task now with a placeholder and let the AI title follow
+        task_text = self.describe_locally(current_app, current_window)
+        pending = task_text is None
+        if pending:
+            task_text = f"Working on: {current_window}"
+
+        task = self.tasks.add({
+            'text': task_text,
+            'completed': False,
+            'created_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'auto_tracked': False,
+            'app_name': current_app,
+            'window_name': current_window
+        })
+
+        if pending:
+            task_id = task['id']
+            future = self.describer.submit(description_key(current_app, current_window),
+                                           current_app, current_window)
+            future.add_done_callback(lambda done: self.post('description', task_id, done))
+        return task
+
+    def toggle_task(self, task_id):
+        task = self.tasks.get(task_id)
+        if not task:
+            return None
+        # Toggle the task's completed status
+        self.tasks.update(task, completed=not task['completed'])
+        if task['completed']:
+            # Move to archive
+            self.archive_store.append(task.copy())
+        return task
+
+    def delete_task(self, task_id):
+        self.tasks.remove([task_id])
+
+    def clear_completed(self):
+        # Move completed tasks to archive
+        completed_tasks = [task for task in self.tasks if task['completed']]
+        self.archive_store.extend(completed_tasks)
+
+        # Remove completed tasks from active list
+        self.tasks.remove([task['id'] for task in completed_tasks])
+        return len(completed_tasks)
+
+    def archive_all(self):
+        # Move all tasks to archive
+        count = len(self.tasks)
+        self.archive_store.extend(self.tasks)
+
+        # Clear all tasks
+        self.tasks.clear()
+        return count
+
+    def snapshot(self, since=None):
+        # All tasks, unless the caller already has this version
+        if since == self.tasks.version:
+            return {'version': self.tasks.version, 'tasks': None}
+        return {'version': self.tasks.version, 'tasks': [dict(task) for task in self.tasks]}
+
+    def status(self):
+        return {
+            'session': self.session,
+            'version': self.tasks.version,
+            'tracking': self.scheduler.state,
+            'stored_app': self.stored_app,
+            'stored_window': self.stored_window,
+            'total': len(self.tasks),
+            'active': self.tasks.active,
+            'completed': self.tasks.completed
+        }
+
+    # Task descriptions
+
+    def reload_patterns(self):
+        try:
+            mtime = os.path.getmtime(self.patterns_file)
+        except OSError:
+            mtime = None
+        if mtime == self.patterns_mtime and self.pattern_rules is not None:
+            return
+        self.patterns_mtime = mtime
+        # Build the new rules completely before swapping them in
+        self.pattern_rules = load_pattern_rules(self.patterns_file)
+
+    def describe_locally(self, app_name, window_name):
+        # Check common patterns and messaging apps (cheap, so they are not cached)
+        with METRICS.timer("helper_describe_seconds", stage="pattern"):
+            description = self.pattern_rules.classify(app_name, window_name)
+        if description is not None:
+            METRICS.inc("helper_descriptions_total", source="pattern")
+            return description
+
+        # Skip the network for anything we have described before
+        key = description_key(app_name, window_name)
+        with METRICS.timer("helper_describe_seconds", stage="cache"):
+            description = self.description_cache.get(key)
+        if description is not None:
+            METRICS.inc("helper_descriptions_total", source="cache")
+            return description
+
+        # ... or for a near-identical title of the same app
+        with METRICS.timer("helper_describe_seconds", stage="similar"):
+            similar = self.description_cache.get_similar(key)
+        if similar is not None:
+            METRICS.inc("helper_descriptions_total", source="similar")
+            return similar[1]
+
+        # ... or for one the local model is confident about
+        with METRICS.timer("helper_describe_seconds", stage="classifier"):
+            description = self.classifier.classify(app_name, window_name)
+        if description is not None:
+            METRICS.inc("helper_descriptions_total", source="classifier")
+        return description
+
+    def request_description(self, app_name, window_name, timeout=None):
+        # Only call OpenAI for unique cases
+        prompt = f"""Given that I'm using {app_name} and the window/tab is '{window_name}', 
+        generate a concise, descriptive task title that explains what I'm likely doing. 
+        Include an appropriate emoji at the start. 
+        Do NOT include the application name in the description since it's already shown in the category.
+        
+        Special rules:
+        - If it's an email/messaging app and shows a specific conversation/email/chat,
+          use "Responding to" instead of "Working on" since the user is likely replying to that conversation.
+        - For other apps, describe the specific action being performed.
+        
+        The response should be just the task title, nothing else."""
+
+        client = self.get_openai_client()
+        METRICS.inc("helper_descriptions_total", source="network")
+        with METRICS.timer("helper_describe_seconds", stage="network"):
+            response = client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": """You are a helpful assistant that generates concise, descriptive task titles. 
+                    For messaging/email apps, use "Responding to" when a specific conversation is shown.
+                    For other apps, describe the specific action being performed.
+                    Never include the application name in the description."""},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=50,
+                temperature=0.7,
+                timeout=timeout
+            )
+
+        task_text = response.choices[0].message.content.strip()
+        self.description_cache.put(description_key(app_name, window_name), task_text)
+        self.classifier.learn(app_name, window_name, task_text)
+        return task_text
+
+    def get_openai_client(self):
+        # Built once, on first use, by whichever worker gets here first. The
+        # pipeline does its own retries; OPENAI_BASE_URL can point the client
+        # at a local server such as fake_openai.py
+        with self.openai_lock:
+            if self.openai_client is None:
+                import openai
+                self.openai_client = openai.OpenAI(max_retries=0)
+            return self.openai_client
+
+    def generate_task_description(self, app_name, window_name):
+        # Blocking variant; add_task goes through self.describer instead
+        try:
+            description = self.describe_locally(app_name, window_name)
+            if description is not None:
+                return description
+            return self.request_description(app_name, window_name)
+        except Exception as e:
+            print(f"Error generating task description: {e}")
+            METRICS.inc("helper_descriptions_total", source="fallback")
+            return f"Working on: {window_name}"
+
+    def apply_description(self, task_id, future):
+        # Fill in an AI title that finished on a describer worker
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            # Keep the placeholder title
+            METRICS.inc("helper_descriptions_total", source="fallback")
+            print(f"Error generating task description: {future.exception()}")
+            return
+
+        task = self.tasks.get(task_id)
+        if task:
+            self.tasks.update(task, text=future.result())
+
+    # Metrics: histograms and counters are recorded inline (see METRICS
+    # calls above); everything else is read through gauges at render time.
+
+    def register_gauges(self):
+        if not METRICS.enabled:
+            return
+        METRICS.describe("helper_probe_seconds", "Time to read the active app and window")
+        METRICS.describe("helper_describe_seconds", "Time spent per task description stage")
+        METRICS.describe("helper_descriptions_total", "Task descriptions by source")
+        METRICS.describe("helper_save_seconds", "Time to queue a full rewrite of a task file")
+        METRICS.describe("helper_refresh_seconds", "Time to redraw the task tree")
+        METRICS.describe("helper_journal_write_seconds", "Time the journal writer spends on disk")
+
+        cache = self.description_cache
+        for key in ('size', 'hits', 'near_hits', 'misses', 'evictions', 'expirations', 'hit_rate'):
+            METRICS.gauge(f"helper_description_cache_{key}", lambda key=key: cache.stats()[key])
+
+        classifier = self.classifier
+        for key in ('size', 'learned', 'predictions', 'hits', 'hit_rate', 'avg_us'):
+            METRICS.gauge(f"helper_classifier_{key}", lambda key=key: classifier.stats()[key])
+
+        describer = self.describer
+        METRICS.gauge("helper_describer_requests", lambda: describer.requests)
+        METRICS.gauge("helper_describer_coalesced", lambda: describer.coalesced)
+        METRICS.gauge("helper_describer_failures", lambda: describer.failures)
+        METRICS.gauge("helper_describer_pending", describer.pending)
+
+        for key in ('pending', 'writes', 'coalesced'):
+            METRICS.gauge(f"helper_writer_{key}", lambda key=key: WRITER.stats()[key])
+
+        METRICS.gauge("helper_sampling_interval_seconds", lambda: self.scheduler.interval)
+        METRICS.gauge("helper_sampling_paused", lambda: int(self.scheduler.paused))
+        METRICS.gauge("helper_probe_avg_ms", lambda: self.probe.timing()['avg_ms'])
+        METRICS.gauge("helper_tasks", lambda: len(self.tasks))
+        METRICS.gauge("helper_tasks_completed", lambda: self.tasks.completed)
+        METRICS.gauge("helper_startup_seconds", lambda: self.archive_store.load_time,
+                      phase="archive_load")
+
+        # Process stats need psutil; skip them if it isn't installed
+        try:
+            import psutil
+        except ImportError:
+            return
+        process = psutil.Process()
+        METRICS.gauge("helper_process_rss_bytes", lambda: process.memory_info().rss)
+        METRICS.gauge("helper_process_cpu_seconds", lambda: sum(process.cpu_times()[:2]))
+
+    def write_metrics(self):
+        # Refresh HELPER_METRICS_FILE every 10 seconds, off the owner thread
+        if not self.metrics_file:
+            return
+        now = time.monotonic()
+        if now - self.metrics_written_at < 10:
+            return
+        self.metrics_written_at = now
+        WRITER.mark(self.write_metrics_file)
+
+    def write_metrics_file(self):
+        try:
+            METRICS.write(self.metrics_file)
+        except OSError as e:
+            print(f"Error writing metrics to {self.metrics_file}: {e}")
+
+    def stats(self):
+        # Numbers for the stats panel. Asking for them turns recording on.
+        if not METRICS.enabled:
+            METRICS.enabled = True
+            self.register_gauges()
+
+        # Other threads may register new series while we read
+        with METRICS.lock:
+            histograms = sorted(METRICS.histograms.items())
+            counters = sorted(METRICS.counters.items())
+
+        timing = self.probe.timing()
+        return {
+            'latency': [[name, [value for _, value in labels], histogram.count,
+                         histogram.quantile(0.5), histogram.quantile(0.95)]
+                        for (name, labels), histogram in histograms],
+            'counters': [[name, [value for _, value in labels], counter.value]
+                         for (name, labels), counter in counters],
+            'cache_hit_rate': self.description_cache.stats()['hit_rate'],
+            'classifier': self.classifier.stats(),
+            'probe_backend': timing['backend'],
+            'probe_avg_ms': timing['avg_ms'],
+            'sampling_interval': self.scheduler.interval
+        }
+
+    def close(self):
+        self.stopping.set()
+        self.describer.shutdown()
+        self.probe.close()
+        self.task_journal.close()
+        self.archive_store.close()
+        self.description_cache.close()
+        METRICS.close()